@@ -9,8 +9,29 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from recipe.events import RecipeEventStream  # noqa: E402
+
+EVENT_STREAM_PATH = '/api/recipe/events/'
+
+recipe_events = RecipeEventStream()
+
+
+async def application(scope, receive, send):
+    """Serve the recipe event stream, everything else through Django."""
+    if scope['type'] == 'http' and scope['path'] == EVENT_STREAM_PATH:
+        await recipe_events(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
+
+if settings.WARM_UP_ON_START:
+    from core.startup import warm_up
+
+    warm_up()
@@ -43,14 +43,30 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'user',
     'recipe',
+    'job',
+    'batch',
 ]
 
+# API-only workers (DJANGO_API_ONLY=1) skip the admin and its
+# autodiscovery of every app's admin module, which shortens cold start.
+API_ONLY = os.environ.get('DJANGO_API_ONLY') == '1'
+
+if API_ONLY:
+    INSTALLED_APPS.remove('django.contrib.admin')
+
+# Preload URL resolvers and model metadata in app.wsgi / app.asgi before
+# the server hands the application any request (see core.startup.warm_up).
+WARM_UP_ON_START = os.environ.get('DJANGO_WARM_UP', '1') == '1'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilerMiddleware',
+    'core.middleware.StatementTimeoutMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -90,6 +106,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/ref/settings/#caches
+
+# Local memory is per process, so caches that need invalidation across
+# workers are only enabled when CACHE_BACKEND names a shared cache.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', LOCAL_CACHE_BACKENDS[0])
+
+SHARED_CACHE = CACHE_BACKEND not in LOCAL_CACHE_BACKENDS
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -136,3 +174,131 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 APPEND_SLASH = False
+
+
+# Background jobs
+
+# The first retry waits this long, doubling on every further attempt.
+JOB_RETRY_BACKOFF_SECONDS = 10
+
+JOB_RETRY_BACKOFF_MAX_SECONDS = 60 * 60
+
+# Running jobs not finished within this time go back to the queue.
+JOB_LEASE_SECONDS = 10 * 60
+
+# Workers renew the lease of a running job this often.
+JOB_LEASE_RENEW_SECONDS = 60
+
+# Rows per transaction when deleting a user's recipes in the background.
+USER_PURGE_BATCH_SIZE = 1000
+
+
+# Request profiling
+
+# Profiles requested by staff with `?_profile=store` are written here.
+PROFILE_DIR = os.environ.get('DJANGO_PROFILE_DIR', '/tmp/profiles')
+
+
+# Slow query log
+
+# Queries taking at least this many milliseconds are recorded per view
+# (see the slow_queries command). An empty value disables the log.
+SLOW_QUERY_THRESHOLD_MS = os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100')
+SLOW_QUERY_THRESHOLD_MS = (
+    float(SLOW_QUERY_THRESHOLD_MS) if SLOW_QUERY_THRESHOLD_MS else None
+)
+
+# Share of slow SELECTs whose EXPLAIN plan is captured.
+SLOW_QUERY_EXPLAIN_RATE = float(
+    os.environ.get('SLOW_QUERY_EXPLAIN_RATE', '0.1')
+)
+
+
+# Batch API
+
+BATCH_MAX_REQUESTS = 20
+
+# Threads used for batches of GET requests sent with `parallel`.
+BATCH_MAX_WORKERS = 4
+
+
+# Recipe delta sync
+
+# Sync cursors lag this far behind the clock to cover in-flight writes.
+SYNC_CURSOR_OVERLAP_SECONDS = 5
+
+# Tombstones are kept this long; older cursors get a full resync.
+SYNC_TOMBSTONE_DAYS = 30
+
+
+# Write-behind last_login
+
+# Buffer last_login updates and write them in bulk; False writes on login.
+LAST_LOGIN_WRITE_BEHIND = os.environ.get('LAST_LOGIN_WRITE_BEHIND', '1') == '1'
+
+LAST_LOGIN_FLUSH_SECONDS = 10
+
+# Buffered users that trigger an immediate flush.
+LAST_LOGIN_BUFFER_SIZE = 1000
+
+
+# Recipe change events (ASGI only)
+
+# Events buffered per stream; a client that falls further behind is told to
+# resync and disconnected instead of growing the queue.
+SSE_QUEUE_SIZE = 100
+
+# Seconds between keep-alive comments on idle streams.
+SSE_HEARTBEAT_SECONDS = 15
+
+
+# Bulk recipe adjustment
+
+# Recipes returned by a preview of `POST /api/recipe/adjust/`.
+ADJUST_PREVIEW_LIMIT = 20
+
+
+# Recipe detail cache
+
+# Seconds a rendered recipe detail is served from the cache; it is also
+# invalidated when the recipe changes. 0 disables the cache, which is the
+# default without a shared cache as other workers would keep stale details.
+RECIPE_DETAIL_CACHE_SECONDS = int(os.environ.get(
+    'RECIPE_DETAIL_CACHE_SECONDS',
+    '300' if SHARED_CACHE else '0'
+))
+
+
+# Recipe title typeahead
+
+# Matches returned by `GET /api/recipe/autocomplete/` without `limit`.
+AUTOCOMPLETE_LIMIT = 10
+
+AUTOCOMPLETE_MAX_LIMIT = 25
+
+
+# Statement timeouts
+
+# statement_timeout in milliseconds for the queries of a request; 0 means
+# no limit. Views may set their own with a `statement_timeout` attribute.
+STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '5000'))
+
+# Timeouts by URL name, taking precedence over view attributes.
+STATEMENT_TIMEOUTS = {
+    'recipe:recipe-sync': 30000,
+}
+
+
+# Request coalescing
+
+# Seconds a request waits for an identical in-flight one before running
+# on its own.
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 2
+
+
+# Recipe partitioning (PostgreSQL)
+
+# Hash partitions of the recipe table by user_id; 0 keeps a plain table.
+# Applied by migrations to an empty table, otherwise by the
+# partition_recipes command.
+RECIPE_PARTITIONS = int(os.environ.get('RECIPE_PARTITIONS', '0'))
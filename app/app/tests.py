@@ -10,3 +10,7 @@ class CalcTests(SimpleTestCase):
     def test_subtract_number(self):
         res = calc.subtract(15, 10)
         self.assertEqual(res, 5)
+
+    def test_multiply_numbers(self):
+        res = calc.multiply(4, 5)
+        self.assertEqual(res, 20)
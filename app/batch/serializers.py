@@ -0,0 +1,42 @@
+"""
+Serializers for the batch API view.
+"""
+from django.conf import settings
+from django.utils.translation import gettext as _
+
+from rest_framework import serializers
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for one request of a batch."""
+    method = serializers.ChoiceField(
+        choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
+        default='GET'
+    )
+    url = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+
+    def validate_url(self, value):
+        """Only allow API urls other than the batch endpoint itself."""
+        if not value.startswith('/api/') or value.startswith('/api/batch'):
+            raise serializers.ValidationError(
+                _('Only API endpoints can be batched.')
+            )
+
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of API requests."""
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        """Limit the number of requests in a batch."""
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                _('A batch may contain at most %(limit)d requests.')
+                % {'limit': settings.BATCH_MAX_REQUESTS}
+            )
+
+        return value
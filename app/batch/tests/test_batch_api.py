@@ -0,0 +1,193 @@
+"""Tests for the batch API."""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+
+BATCH_URL = reverse('batch:batch')
+ME_URL = reverse('user:me')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_user(**params):
+    """Create and return new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Create and return sample recipe."""
+    default = {
+        'title': 'sample title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    default.update(params)
+    return Recipe.objects.create(user=user, **default)
+
+
+class PublicBatchAPITests(TestCase):
+    """Test unauthenticated batch API requests."""
+
+    def test_auth_required(self):
+        """Test authentication is required for batches."""
+        client = APIClient()
+
+        res = client.post(
+            BATCH_URL,
+            {'requests': [{'url': ME_URL}]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchAPITests(TestCase):
+    """Test authenticated batch API requests."""
+
+    def setUp(self):
+        self.user = create_user(
+            name='Test User',
+            email='test@example.com',
+            password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_runs_requests_in_order(self):
+        """Test responses of all sub-requests are returned in order."""
+        recipe = create_recipe(self.user)
+        payload = {
+            'requests': [
+                {'url': ME_URL},
+                {'url': RECIPE_URL},
+                {
+                    'method': 'PATCH',
+                    'url': reverse('recipe:recipe-detail', args=[recipe.id]),
+                    'body': {'title': 'new title'},
+                },
+            ]
+        }
+
+        res = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        me, recipes, patched = res.data['responses']
+        self.assertEqual(me['status'], status.HTTP_200_OK)
+        self.assertEqual(me['body']['email'], self.user.email)
+        self.assertEqual(recipes['body'][0]['id'], recipe.id)
+        self.assertEqual(patched['status'], status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'new title')
+
+    def test_unknown_url_returns_not_found(self):
+        """Test a sub-request to an unknown url gets a 404 entry."""
+        res = self.client.post(
+            BATCH_URL,
+            {'requests': [{'url': '/api/unknown'}]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['responses'][0]['status'],
+            status.HTTP_404_NOT_FOUND
+        )
+
+    def test_batch_size_limited(self):
+        """Test batches over BATCH_MAX_REQUESTS are rejected."""
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            res = self.client.post(
+                BATCH_URL,
+                {'requests': [{'url': ME_URL}] * 3},
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nested_batch_rejected(self):
+        """Test the batch endpoint cannot be batched."""
+        res = self.client.post(
+            BATCH_URL,
+            {'requests': [{'method': 'POST', 'url': BATCH_URL}]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(STATEMENT_TIMEOUTS={'recipe:recipe-list': 1234})
+    def test_sub_request_runs_under_its_view_timeout(self):
+        """Test a sub-request gets the statement timeout of its view."""
+        self.client.post(
+            BATCH_URL,
+            {'requests': [{'url': RECIPE_URL}]},
+            format='json'
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], '1234ms')
+
+    @override_settings(STATEMENT_TIMEOUTS={'recipe:recipe-list': 1})
+    def test_canceled_sub_request_returns_503(self):
+        """Test a sub-request over its deadline is a counted 503."""
+        metrics.reset()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_recipe (user_id, title, time_minutes, "
+                "price, link, description, updated_at, version) "
+                "SELECT %s, md5(g::text), 1, 1, '', '', now(), 1 "
+                "FROM generate_series(1, 200000) g",
+                [self.user.id]
+            )
+
+        res = self.client.post(
+            BATCH_URL,
+            {'requests': [{'url': RECIPE_URL}]},
+            format='json'
+        )
+
+        response = res.data['responses'][0]
+        self.assertEqual(
+            response['status'],
+            status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response['headers']['Retry-After'], '1')
+        self.assertEqual(
+            metrics.get('statement_timeouts', view='recipe:recipe-list'),
+            1
+        )
+
+
+class ParallelBatchAPITests(TransactionTestCase):
+    """Test batches of reads run in parallel."""
+
+    def test_parallel_reads(self):
+        """Test parallel GET sub-requests each see committed data."""
+        user = create_user(email='test@example.com', password='pass1234')
+        recipes = [create_recipe(user, title=f'r{i}') for i in range(3)]
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            'parallel': True,
+            'requests': [
+                {'url': reverse('recipe:recipe-detail', args=[recipe.id])}
+                for recipe in recipes
+            ],
+        }
+
+        res = client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [response['body']['title'] for response in res.data['responses']],
+            ['r0', 'r1', 'r2']
+        )
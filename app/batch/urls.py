@@ -0,0 +1,13 @@
+"""
+Url mappings for batch API.
+"""
+from django.urls import path
+
+from batch import views
+
+
+app_name = 'batch'
+
+urlpatterns = [
+    path('', views.BatchView.as_view(), name='batch')
+]
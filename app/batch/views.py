@@ -0,0 +1,153 @@
+"""
+Views for the batch API.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from rest_framework import (
+    authentication,
+    permissions,
+    status,
+)
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from batch.serializers import BatchSerializer
+from core.deadlines import (
+    TIMEOUT_DETAIL,
+    is_query_canceled,
+    record_timeout,
+    statement_deadline,
+)
+
+
+logger = logging.getLogger(__name__)
+
+"""META keys describing the body of the outer request"""
+BODY_META_KEYS = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'wsgi.input')
+
+
+class BatchView(APIView):
+    """Run several API requests in one round-trip.
+
+    The caller is authenticated once and every sub-request runs in-process
+    as that user, in order. With `parallel` set and only GET requests, the
+    sub-requests run concurrently on BATCH_MAX_WORKERS threads. Writes are
+    not wrapped in a common transaction.
+    """
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Run the batch and return the responses in request order."""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data['requests']
+
+        parallel = serializer.validated_data['parallel'] and all(
+            sub_request['method'] == 'GET' for sub_request in sub_requests
+        )
+        if parallel:
+            with ThreadPoolExecutor(settings.BATCH_MAX_WORKERS) as executor:
+                responses = list(executor.map(
+                    lambda sub_request: self.run_in_thread(
+                        request,
+                        sub_request
+                    ),
+                    sub_requests,
+                ))
+        else:
+            responses = [
+                self.run_sub_request(request, sub_request)
+                for sub_request in sub_requests
+            ]
+
+        return Response({'responses': responses}, status=status.HTTP_200_OK)
+
+    def run_in_thread(self, request, sub_request):
+        """Run a sub-request and close the thread's database connections."""
+        try:
+            return self.run_sub_request(request, sub_request)
+        finally:
+            connections.close_all()
+
+    def run_sub_request(self, request, sub_request):
+        """Resolve and call the view of a sub-request."""
+        url = urlsplit(sub_request['url'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return {
+                'status': status.HTTP_404_NOT_FOUND,
+                'headers': {},
+                'body': {'detail': 'Not found.'},
+            }
+
+        sub = self.build_request(request, sub_request, url)
+        try:
+            with statement_deadline(match.func, match.view_name):
+                response = match.func(sub, *match.args, **match.kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+        except Exception as exception:
+            if is_query_canceled(exception):
+                record_timeout(match.view_name)
+                return {
+                    'status': status.HTTP_503_SERVICE_UNAVAILABLE,
+                    'headers': {'Retry-After': '1'},
+                    'body': {'detail': TIMEOUT_DETAIL},
+                }
+            logger.exception('batched %s failed', url.path)
+            return {
+                'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                'headers': {},
+                'body': {'detail': 'Server error.'},
+            }
+        finally:
+            """let the batch's own queries restore its timeout"""
+            outer = getattr(request, 'statement_deadline', None)
+            if outer is not None:
+                outer.applied = False
+
+        content_type = response.get('Content-Type', '')
+        body = response.content.decode(response.charset)
+        if content_type.startswith('application/json') and body:
+            body = json.loads(body)
+
+        return {
+            'status': response.status_code,
+            'headers': dict(response.items()),
+            'body': body,
+        }
+
+    def build_request(self, request, sub_request, url):
+        """Build a request for sub_request authenticated as the caller."""
+        body = b''
+        if 'body' in sub_request:
+            body = json.dumps(sub_request['body']).encode()
+
+        environ = {
+            key: value for key, value in request.META.items()
+            if key not in BODY_META_KEYS
+        }
+        environ.update({
+            'REQUEST_METHOD': sub_request['method'],
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+        })
+
+        sub = WSGIRequest(environ)
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        return sub
@@ -54,3 +54,6 @@ class UserAdmin(BaseUserAdmin):
 
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
+admin.site.register(models.RecipeStats)
+admin.site.register(models.Job)
+admin.site.register(models.SlowQuery)
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        """Connect the signal receivers of the core app."""
+        from django.contrib.auth.signals import user_logged_in
+        from django.db.backends.signals import connection_created
+        from core.deadlines import forget_statement_timeout
+        from core.writebehind import record_login
+
+        """buffer last_login writes instead of one UPDATE per login"""
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(record_login, dispatch_uid='record_login')
+
+        connection_created.connect(
+            forget_statement_timeout,
+            dispatch_uid='forget_statement_timeout',
+        )
@@ -0,0 +1,112 @@
+"""
+Per view Postgres statement timeouts.
+
+A view's deadline comes from STATEMENT_TIMEOUTS by URL name, else from a
+`statement_timeout` attribute (milliseconds) on the view, else from
+STATEMENT_TIMEOUT_MS. It is applied with `SET statement_timeout` right
+before the first query of the request, and only when the session does
+not already have it, so requests without queries pay nothing and a
+worker serving the same view repeatedly sets it once.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import metrics
+
+
+log = logging.getLogger(__name__)
+
+"""SQLSTATE of a statement canceled by statement_timeout"""
+QUERY_CANCELED = '57014'
+
+TIMEOUT_DETAIL = 'The request took too long, try again later.'
+
+
+def get_statement_timeout(view_func, view_name=None):
+    """Return the statement timeout in milliseconds for a view."""
+    if view_name in settings.STATEMENT_TIMEOUTS:
+        return settings.STATEMENT_TIMEOUTS[view_name]
+
+    view = getattr(view_func, 'cls', view_func)
+    timeout = getattr(view, 'statement_timeout', None)
+    if timeout is not None:
+        return timeout
+
+    return settings.STATEMENT_TIMEOUT_MS
+
+
+def is_query_canceled(exception):
+    """Return whether exception was caused by a canceled statement."""
+    while exception is not None:
+        if getattr(exception, 'pgcode', None) == QUERY_CANCELED:
+            return True
+        exception = exception.__cause__
+
+    return False
+
+
+def record_timeout(view):
+    """Count and log a statement canceled in view."""
+    metrics.increment('statement_timeouts', view=view)
+    log.warning('statement timeout in %s', view)
+
+
+@contextmanager
+def statement_deadline(view_func, view_name=None, using=DEFAULT_DB_ALIAS):
+    """Apply the timeout of a view to queries run inside the block.
+
+    Used where a view is called outside the middleware chain, e.g. by
+    batched sub-requests.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        yield None
+        return
+
+    deadline = StatementDeadline(
+        connection,
+        get_statement_timeout(view_func, view_name),
+    )
+    with connection.execute_wrapper(deadline):
+        yield deadline
+
+
+class StatementDeadline:
+    """Execute wrapper setting statement_timeout before a request's query.
+
+    The session value is remembered on the connection wrapper and
+    forgotten by `forget_statement_timeout` whenever a new session is
+    opened. A SET made inside a transaction may be rolled back with it,
+    so it is only remembered for the current request then.
+    """
+
+    def __init__(self, connection, timeout=None):
+        self.connection = connection
+        self.timeout = timeout
+        self.applied = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.timeout is not None and not self.applied:
+            self.apply(context['cursor'].cursor)
+
+        return execute(sql, params, many, context)
+
+    def apply(self, cursor):
+        """Set the session statement_timeout unless already set."""
+        self.applied = True
+        if getattr(self.connection, 'statement_timeout', None) \
+                == self.timeout:
+            return
+
+        cursor.execute('SET statement_timeout = %s', [int(self.timeout)])
+        self.connection.statement_timeout = (
+            None if self.connection.in_atomic_block else self.timeout
+        )
+
+
+def forget_statement_timeout(sender, connection, **kwargs):
+    """connection_created receiver: a new session has the default."""
+    connection.statement_timeout = None
@@ -0,0 +1,233 @@
+"""
+Database backed background jobs.
+
+Handlers are registered with the `job` decorator in a `tasks` module of
+any installed app and run by the `run_jobs` management command. Handlers
+registered with `every` are also queued by the workers on that interval.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+_periodic = {}
+
+
+def job(name, every=None):
+    """Register the decorated function as handler of jobs called `name`.
+
+    With `every`, a timedelta, `schedule_periodic` keeps one such job
+    queued to run that long after the previous one finished.
+    """
+    def decorator(func):
+        _handlers[name] = func
+        if every is not None:
+            _periodic[name] = every
+        return func
+
+    return decorator
+
+
+def get_handler(name):
+    """Return the handler registered for `name`."""
+    if name not in _handlers:
+        autodiscover_modules('tasks')
+
+    try:
+        return _handlers[name]
+    except KeyError:
+        raise LookupError(f'no job handler registered as {name!r}')
+
+
+def enqueue(name, payload=None, user=None, max_attempts=5, delay=None):
+    """Queue a job and return it; workers see it once it is committed."""
+    get_handler(name)
+    run_after = timezone.now()
+    if delay:
+        run_after += delay
+
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        max_attempts=max_attempts,
+        run_after=run_after,
+    )
+
+
+def claim(worker, limit=1):
+    """Lock, mark running and return up to `limit` due jobs for `worker`."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')[:limit]
+        )
+        if not jobs:
+            return []
+
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=Job.STATUS_RUNNING,
+            attempts=F('attempts') + 1,
+            locked_by=worker,
+            locked_at=now,
+        )
+
+    for claimed in jobs:
+        claimed.refresh_from_db()
+
+    return jobs
+
+
+def retry_delay(attempts):
+    """Return how long to wait before the next attempt of a failed job."""
+    seconds = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(
+        seconds=min(seconds, settings.JOB_RETRY_BACKOFF_MAX_SECONDS)
+    )
+
+
+def renew_lease(claimed):
+    """Move the lease of a running job forward; False if it was lost."""
+    return Job.objects.filter(
+        pk=claimed.pk,
+        status=Job.STATUS_RUNNING,
+        locked_by=claimed.locked_by,
+    ).update(locked_at=timezone.now()) == 1
+
+
+class LeaseKeeper(threading.Thread):
+    """Renew the lease of a job every JOB_LEASE_RENEW_SECONDS until stopped.
+
+    Runs on its own database connection, so renewals commit even while
+    the handler holds a transaction open.
+    """
+
+    def __init__(self, claimed):
+        super().__init__(name=f'lease-{claimed.pk}', daemon=True)
+        self.claimed = claimed
+        self.stopping = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopping.wait(settings.JOB_LEASE_RENEW_SECONDS):
+                if not renew_lease(self.claimed):
+                    logger.warning('job %s lost its lease', self.claimed.pk)
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+
+def run(claimed):
+    """Run a claimed job and record its outcome.
+
+    The outcome is only written while `claimed` still holds its lease;
+    a job requeued meanwhile is left to the worker that claimed it next.
+    """
+    keeper = LeaseKeeper(claimed)
+    keeper.start()
+    try:
+        result = get_handler(claimed.name)(claimed)
+    except Exception:
+        logger.exception('job %s failed', claimed.pk)
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts >= claimed.max_attempts:
+            claimed.status = Job.STATUS_FAILED
+            claimed.finished_at = timezone.now()
+        else:
+            claimed.status = Job.STATUS_QUEUED
+            claimed.run_after = timezone.now() + retry_delay(claimed.attempts)
+    else:
+        claimed.status = Job.STATUS_SUCCEEDED
+        claimed.result = result
+        claimed.finished_at = timezone.now()
+    finally:
+        keeper.stop()
+
+    finished = Job.objects.filter(
+        pk=claimed.pk,
+        status=Job.STATUS_RUNNING,
+        locked_by=claimed.locked_by,
+    ).update(
+        status=claimed.status,
+        result=claimed.result,
+        last_error=claimed.last_error,
+        run_after=claimed.run_after,
+        finished_at=claimed.finished_at,
+        locked_by='',
+        locked_at=None,
+    )
+    if not finished:
+        logger.warning('job %s lost its lease, outcome dropped', claimed.pk)
+        claimed.refresh_from_db()
+        return claimed
+
+    claimed.locked_by = ''
+    claimed.locked_at = None
+
+    return claimed
+
+
+def requeue_stale():
+    """Put running jobs whose lease expired back in the queue."""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED,
+        last_error='worker lease expired',
+        locked_by='',
+        locked_at=None,
+        finished_at=now,
+    )
+
+    return stale.update(
+        status=Job.STATUS_QUEUED,
+        locked_by='',
+        locked_at=None,
+        run_after=now,
+    )
+
+
+def schedule_periodic():
+    """Queue every periodic job that is neither queued nor running."""
+    autodiscover_modules('tasks')
+    now = timezone.now()
+    scheduled = []
+    for name, every in _periodic.items():
+        pending = Job.objects.filter(
+            name=name,
+            status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING],
+        )
+        if pending.exists():
+            continue
+
+        last = Job.objects.filter(
+            name=name,
+            finished_at__isnull=False,
+        ).order_by('-finished_at').values_list('finished_at', flat=True)
+        delay = last[0] + every - now if last else None
+        scheduled.append(enqueue(name, delay=delay))
+
+    return scheduled
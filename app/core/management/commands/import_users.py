@@ -0,0 +1,113 @@
+"""
+Django command to import users in bulk from a CSV file.
+"""
+import csv
+import sys
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from user.serializers import is_duplicate_email
+
+
+class Command(BaseCommand):
+    """Django command to create users from `email,name,password` rows"""
+
+    help = 'Import users from a CSV file with email, name and optional ' \
+           'password columns; existing emails are skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV file with a header row, or - for stdin.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users inserted per statement.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        self.verbosity = options['verbosity']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive number.')
+
+        if options['path'] == '-':
+            created, skipped = self.import_rows(sys.stdin, batch_size)
+        else:
+            try:
+                with open(options['path'], newline='') as csv_file:
+                    created, skipped = self.import_rows(csv_file, batch_size)
+            except OSError as error:
+                raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} users, skipped {skipped} existing emails.'
+        ))
+
+    def import_rows(self, csv_file, batch_size):
+        """Insert users of csv_file in batches, return (created, skipped)."""
+        rows = csv.DictReader(csv_file)
+        if 'email' not in (rows.fieldnames or []):
+            raise CommandError('CSV file needs an email column.')
+
+        created = skipped = 0
+        while True:
+            batch = [
+                self.build_user(row) for row in islice(rows, batch_size)
+            ]
+            if not batch:
+                return created, skipped
+
+            inserted = self.insert(batch)
+            created += inserted
+            skipped += len(batch) - inserted
+
+    def build_user(self, row):
+        """Return an unsaved user for a CSV row."""
+        User = get_user_model()
+        email = User.objects.normalize_email((row['email'] or '').strip())
+        if not email:
+            raise CommandError(f'Row without email: {row}')
+
+        return User(
+            email=email,
+            name=(row.get('name') or '').strip(),
+            password=make_password(row.get('password') or None),
+        )
+
+    def insert(self, users):
+        """Insert users relying on the unique email constraint.
+
+        The whole batch is tried as one INSERT. Only when it hits the
+        constraint are its users inserted one by one in savepoints to
+        find and skip the duplicates. Returns the number inserted.
+        """
+        User = get_user_model()
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            return len(users)
+        except IntegrityError as error:
+            if not is_duplicate_email(error):
+                raise
+
+        inserted = 0
+        for user in users:
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+                inserted += 1
+            except IntegrityError as error:
+                if not is_duplicate_email(error):
+                    raise
+                if self.verbosity > 1:
+                    self.stdout.write(f'Skipped existing email {user.email}')
+
+        return inserted
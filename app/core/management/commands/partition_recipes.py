@@ -0,0 +1,120 @@
+"""
+Django command to move recipes into a hash partitioned table online.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import partitioning
+
+
+class Command(BaseCommand):
+    """Django command to partition the recipe table by user_id"""
+
+    help = 'Copy recipes into a table hash partitioned by user_id in ' \
+           'batches while writes are mirrored, then swap it in place.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions',
+            type=int,
+            default=settings.RECIPE_PARTITIONS or 16,
+            help='Number of hash partitions of a new partitioned table.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Range of recipe ids copied per transaction.',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches.',
+        )
+        parser.add_argument(
+            '--no-swap',
+            action='store_true',
+            help='Only copy; run again later to swap.',
+        )
+        parser.add_argument(
+            '--drop-old',
+            action='store_true',
+            help='Drop the unpartitioned table after the swap.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive number.')
+
+        with connection.cursor() as cursor:
+            try:
+                self.partition(cursor, options)
+            except partitioning.PartitioningError as error:
+                raise CommandError(str(error))
+
+    def partition(self, cursor, options):
+        if partitioning.table_kind(cursor, partitioning.TABLE) \
+                == 'partitioned':
+            self.stdout.write('Recipes are already partitioned.')
+            if options['drop_old']:
+                partitioning.drop_unpartitioned(cursor)
+            return
+
+        with transaction.atomic():
+            if partitioning.table_kind(cursor, partitioning.PARTITIONED) \
+                    is None:
+                partitioning.create_partitioned_table(
+                    cursor,
+                    options['partitions'],
+                )
+                self.stdout.write(
+                    f'Created {options["partitions"]} partitions.'
+                )
+            partitioning.install_mirror(cursor)
+
+        first_id, last_id = partitioning.id_range(cursor)
+        copied = 0
+        if first_id is not None:
+            batch_size = options['batch_size']
+            for start in range(first_id, last_id + 1, batch_size):
+                with transaction.atomic():
+                    copied += partitioning.copy_batch(
+                        cursor,
+                        start,
+                        start + batch_size - 1,
+                    )
+                self.stdout.write(
+                    f'Copied ids up to {min(start + batch_size - 1, last_id)}'
+                    f' of {last_id}.'
+                )
+                if options['pause']:
+                    time.sleep(options['pause'])
+        self.stdout.write(f'Copied {copied} recipes.')
+        if first_id is not None:
+            for start in range(first_id, last_id + 1, batch_size):
+                end = start + batch_size - 1
+                if partitioning.verify_batch(cursor, start, end):
+                    raise CommandError(
+                        f'Recipes with ids {start} to {end} differ from '
+                        f'the copy; drop {partitioning.PARTITIONED} and '
+                        f'start over.'
+                    )
+            self.stdout.write(f'Verified recipes up to id {last_id}.')
+
+        if options['no_swap']:
+            self.stdout.write('Writes are mirrored until the swap.')
+            return
+
+        with transaction.atomic():
+            partitioning.swap(cursor, last_id)
+            if options['drop_old']:
+                partitioning.drop_unpartitioned(cursor)
+
+        self.stdout.write(self.style.SUCCESS('Recipes are partitioned.'))
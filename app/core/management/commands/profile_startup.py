@@ -0,0 +1,122 @@
+"""
+Django command to measure import and start up time of the project.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import parse_importtime
+
+
+"""code timed in a fresh interpreter for each target"""
+PROBE = '''
+import json, os, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phases = {'settings': time.perf_counter() - started}
+mark = time.perf_counter()
+django.setup()
+phases['app_registry'] = time.perf_counter() - mark
+mark = time.perf_counter()
+target = %(target)r
+if target == 'manage':
+    from django.core.management import get_commands, load_command_class
+    load_command_class(get_commands()['check'], 'check')
+else:
+    __import__('app.' + target)
+phases[target] = time.perf_counter() - mark
+if %(warm_up)r:
+    mark = time.perf_counter()
+    from core.startup import warm_up
+    warm_up()
+    phases['warm_up'] = time.perf_counter() - mark
+phases['total'] = time.perf_counter() - started
+print(json.dumps(phases))
+'''
+
+TARGETS = ['manage', 'wsgi', 'asgi']
+
+
+class Command(BaseCommand):
+    """Django command to report cold start time per phase and module"""
+
+    help = 'Measure import time and app registry setup of manage.py, ' \
+           'app.wsgi and app.asgi in fresh interpreters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets',
+            nargs='*',
+            choices=TARGETS,
+            help='Entrypoints to profile, all of them by default.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of slowest modules listed per target.',
+        )
+        parser.add_argument(
+            '--warm-up',
+            action='store_true',
+            help='Also time core.startup.warm_up().',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the report as JSON.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        report = {
+            target: self.profile(target, options['warm_up'], options['top'])
+            for target in options['targets'] or TARGETS
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for target, result in report.items():
+            self.stdout.write(self.style.SUCCESS(f'== {target}'))
+            for phase, seconds in result['phases'].items():
+                self.stdout.write(f'{phase:>14}: {seconds * 1000:9.1f} ms')
+
+            self.stdout.write('  slowest imports (cumulative / self ms):')
+            for module in result['modules']:
+                self.stdout.write(
+                    f'{module["cumulative_ms"]:9.1f} '
+                    f'{module["self_ms"]:9.1f}  '
+                    f'{"  " * module["depth"]}{module["module"]}'
+                )
+
+    def profile(self, target, warm_up, top):
+        """Run the probe for target and return its phases and modules."""
+        probe = PROBE % {'target': target, 'warm_up': warm_up}
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', probe],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_WARM_UP': '0'},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode:
+            raise CommandError(
+                f'profiling {target} failed:\n{process.stderr[-2000:]}'
+            )
+
+        modules = parse_importtime(process.stderr)
+        modules.sort(key=lambda module: module['cumulative_ms'], reverse=True)
+
+        return {
+            'phases': json.loads(process.stdout.splitlines()[-1]),
+            'modules': modules[:top],
+        }
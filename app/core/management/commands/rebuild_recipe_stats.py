@@ -0,0 +1,89 @@
+"""
+Django command to rebuild or verify per-user recipe stats.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import RecipeStats
+
+
+class Command(BaseCommand):
+    """Django command to rebuild RecipeStats from recipes in batches"""
+
+    help = 'Rebuild (or with --verify, check) per-user recipe stats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report users whose stored stats are wrong.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users handled per batch.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        verify = options['verify']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive number.')
+
+        checked = 0
+        mismatched = 0
+        for user_ids in self.user_id_batches(batch_size):
+            checked += len(user_ids)
+            wrong = self.mismatched_users(user_ids)
+            mismatched += len(wrong)
+
+            if verify:
+                for user_id in wrong:
+                    self.stdout.write(
+                        self.style.WARNING(f'Stats of user {user_id} differ.')
+                    )
+            else:
+                RecipeStats.objects.rebuild(user_ids)
+
+        if verify and mismatched:
+            raise CommandError(
+                f'{mismatched} of {checked} users have wrong recipe stats.'
+            )
+
+        action = 'Verified' if verify else 'Rebuilt'
+        self.stdout.write(
+            self.style.SUCCESS(f'{action} recipe stats of {checked} users.')
+        )
+
+    def user_id_batches(self, batch_size):
+        """Yield lists of user ids in primary key order."""
+        users = get_user_model().objects.order_by('pk')
+        last_id = None
+
+        while True:
+            batch = users if last_id is None else users.filter(pk__gt=last_id)
+            user_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                return
+
+            yield user_ids
+            last_id = user_ids[-1]
+
+    def mismatched_users(self, user_ids):
+        """Return ids of users whose stored stats differ from their recipes."""
+        actual = RecipeStats.objects.compute(user_ids)
+        stored = {
+            stats.user_id: (
+                stats.recipe_count,
+                stats.price_total,
+                stats.time_minutes_total,
+            )
+            for stats in RecipeStats.objects.filter(user_id__in=user_ids)
+        }
+
+        return [
+            user_id for user_id in user_ids
+            if actual.get(user_id, (0, 0, 0)) != stored.get(user_id, (0, 0, 0))
+        ]
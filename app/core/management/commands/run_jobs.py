@@ -0,0 +1,108 @@
+"""
+Django command to run queued background jobs.
+"""
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run background jobs from the database queue"""
+
+    help = 'Run queued background jobs until stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of jobs run at the same time.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of waiting.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be a positive number.')
+
+        self.poll_interval = options['poll_interval']
+        self.burst = options['burst']
+        self.stopping = threading.Event()
+        self.worker_name = f'{socket.gethostname()}:{os.getpid()}'
+
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                handlers[signum] = signal.signal(signum, self.stop)
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs.')
+        for job in jobs.schedule_periodic():
+            self.stdout.write(f'Scheduled job {job.pk} {job.name}.')
+
+        self.stdout.write(
+            f'Running jobs as {self.worker_name} '
+            f'with concurrency {concurrency}...'
+        )
+        if concurrency == 1:
+            self.work(0)
+        else:
+            threads = [
+                threading.Thread(target=self.work, args=(index,), daemon=True)
+                for index in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
+
+    def stop(self, signum, frame):
+        """Finish running jobs, then exit."""
+        self.stdout.write('Stopping after running jobs finish...')
+        self.stopping.set()
+
+    def work(self, index):
+        """Claim and run jobs one at a time until stopped."""
+        worker = f'{self.worker_name}:{index}'
+        try:
+            while not self.stopping.is_set():
+                if not connection.in_atomic_block:
+                    close_old_connections()
+                claimed = jobs.claim(worker)
+                if not claimed:
+                    if self.burst:
+                        return
+                    if index == 0:
+                        jobs.requeue_stale()
+                        jobs.schedule_periodic()
+                    self.stopping.wait(self.poll_interval)
+                    continue
+
+                for job in claimed:
+                    job = jobs.run(job)
+                    self.stdout.write(f'Job {job.pk} {job.name}: {job.status}')
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
@@ -0,0 +1,102 @@
+"""
+Django command to serve the project with pre-forked worker processes.
+"""
+import importlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.server import PreforkServer, default_worker_count
+
+
+class Command(BaseCommand):
+    """Django command to run the pre-forking WSGI server"""
+
+    help = 'Serve app.wsgi with a pool of pre-forked worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'addrport',
+            nargs='?',
+            default='0.0.0.0:8000',
+            help='Address and port to listen on.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=default_worker_count(),
+            help='Number of worker processes, the CPU count by default.',
+        )
+        parser.add_argument(
+            '--max-requests',
+            type=int,
+            default=1000,
+            help='Recycle a worker after this many requests (0 disables).',
+        )
+        parser.add_argument(
+            '--max-requests-jitter',
+            type=int,
+            default=100,
+            help='Random extra requests so workers do not recycle together.',
+        )
+        parser.add_argument(
+            '--max-memory',
+            type=int,
+            default=0,
+            help='Recycle a worker above this resident memory in MB.',
+        )
+        parser.add_argument(
+            '--graceful-timeout',
+            type=int,
+            default=30,
+            help='Seconds workers get to finish requests on shutdown.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Connections each worker handles at the same time.',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=30,
+            help='Seconds a connection may stay silent before it is closed '
+                 '(0 disables).',
+        )
+        parser.add_argument(
+            '--backlog',
+            type=int,
+            default=2048,
+            help='Size of the listen queue.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        host, _, port = options['addrport'].rpartition(':')
+        if not port.isdigit():
+            raise CommandError(f'"{options["addrport"]}" is not a valid port.')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be a positive number.')
+        if options['threads'] < 1:
+            raise CommandError('--threads must be a positive number.')
+        if options['timeout'] < 0:
+            raise CommandError('--timeout must not be negative.')
+
+        """import and warm up the app once so workers share it"""
+        application = importlib.import_module('app.wsgi').application
+
+        server = PreforkServer(
+            application,
+            host.strip('[]') or '0.0.0.0',
+            int(port),
+            options['workers'],
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            max_memory_mb=options['max_memory'],
+            graceful_timeout=options['graceful_timeout'],
+            timeout=options['timeout'] or None,
+            threads=options['threads'],
+            backlog=options['backlog'],
+            log=self.stdout.write,
+        )
+        server.run()
@@ -0,0 +1,71 @@
+"""
+Django command to report the slowest recorded queries.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import SlowQuery
+
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'calls': '-calls',
+}
+
+
+class Command(BaseCommand):
+    """Django command to list top slow queries from the slow query log"""
+
+    help = 'List the slowest recorded queries, by total time by default.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of queries listed.',
+        )
+        parser.add_argument(
+            '--order',
+            choices=ORDERINGS,
+            default='total',
+            help='Rank queries by total time, max time or calls.',
+        )
+        parser.add_argument(
+            '--view',
+            help='Only list queries run by this view name.',
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Show captured EXPLAIN plans.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Delete the recorded queries after listing them.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        queries = SlowQuery.objects.order_by(ORDERINGS[options['order']])
+        if options['view']:
+            queries = queries.filter(view=options['view'])
+
+        for rank, query in enumerate(queries[:options['top']], start=1):
+            self.stdout.write(self.style.WARNING(
+                f'#{rank} {query.view}  total {query.total_ms:.1f} ms  '
+                f'calls {query.calls}  '
+                f'avg {query.total_ms / query.calls:.1f} ms  '
+                f'max {query.max_ms:.1f} ms'
+            ))
+            self.stdout.write(f'    {query.sql}')
+            if options['plans'] and query.plan:
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'      {line}')
+
+        if options['reset']:
+            deleted, _ = queries.delete()
+            self.stdout.write(
+                self.style.SUCCESS(f'Deleted {deleted} recorded queries.')
+            )
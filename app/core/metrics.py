@@ -0,0 +1,40 @@
+"""
+Process local counters.
+
+Counters live in the memory of each process and start from zero on
+restart. They are cheap enough to bump on hot paths and are read through
+`snapshot()`, e.g. by a scraper or while debugging.
+"""
+import threading
+from collections import Counter
+
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def increment(name, amount=1, **labels):
+    """Add amount to the counter name with labels."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += amount
+
+
+def get(name, **labels):
+    """Return the value of counter name with labels."""
+    return _counters[(name, tuple(sorted(labels.items())))]
+
+
+def snapshot():
+    """Return [(name, labels, value)] of all counters."""
+    with _lock:
+        return [
+            (name, dict(labels), value)
+            for (name, labels), value in _counters.items()
+        ]
+
+
+def reset():
+    """Drop all counters."""
+    with _lock:
+        _counters.clear()
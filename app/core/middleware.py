@@ -0,0 +1,195 @@
+"""
+Project middleware.
+"""
+import io
+import json
+import logging
+import os
+import zipfile
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import querylog
+from core.deadlines import (
+    TIMEOUT_DETAIL,
+    StatementDeadline,
+    get_statement_timeout,
+    is_query_canceled,
+    record_timeout,
+)
+from core.profiling import RequestProfile
+
+
+log = logging.getLogger(__name__)
+
+
+def get_token_user(request):
+    """Return the user of the request's auth token, or None."""
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(
+            auth[1].decode()
+        )
+    except (AuthenticationFailed, UnicodeError):
+        return None
+
+    return user
+
+
+class ProfilerMiddleware:
+    """Profile requests of staff users that ask for it.
+
+    A request with `?_profile=<mode>` or an `X-Profile: <mode>` header is
+    run under cProfile with its SQL recorded, when sent by an active staff
+    user. Modes: `json` returns a summary instead of the response, `pstats`
+    returns a zip of the binary profile and the SQL as JSON, and `store`
+    writes both to PROFILE_DIR and returns the normal response. Other
+    requests only pay for the lookup.
+    """
+
+    MODES = ('json', 'pstats', 'store')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get('_profile') or request.headers.get('X-Profile')
+        if not mode:
+            return self.get_response(request)
+
+        if mode not in self.MODES or not self.is_allowed(request):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        response = profile.run(self.get_response, request)
+
+        if mode == 'pstats':
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as files:
+                files.writestr('request.pstats', profile.dump())
+                files.writestr('queries.json', json.dumps(
+                    profile.sql(),
+                    cls=DjangoJSONEncoder,
+                ))
+            dump = HttpResponse(
+                archive.getvalue(),
+                content_type='application/zip'
+            )
+            dump['Content-Disposition'] = \
+                'attachment; filename="request-profile.zip"'
+            return dump
+
+        if mode == 'store':
+            name, queries_name = self.store(request, profile)
+            response['X-Profile-File'] = name
+            response['X-Profile-Queries-File'] = queries_name
+            return response
+
+        summary = profile.summary()
+        summary['path'] = request.get_full_path()
+        summary['status'] = response.status_code
+        return JsonResponse(summary)
+
+    def is_allowed(self, request):
+        """Return whether the request was sent by an active staff user."""
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            user = get_token_user(request)
+
+        return bool(user and user.is_active and user.is_staff)
+
+    def store(self, request, profile):
+        """Write the profile and its SQL to PROFILE_DIR, return file names."""
+        stem = '{}-{}'.format(
+            timezone.now().strftime('%Y%m%dT%H%M%S%f'),
+            request.path.strip('/').replace('/', '.') or 'root',
+        )
+        name = f'{stem}.pstats'
+        queries_name = f'{stem}.queries.json'
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profile.stats().dump_stats(os.path.join(settings.PROFILE_DIR, name))
+        with open(os.path.join(settings.PROFILE_DIR, queries_name), 'w') as f:
+            json.dump(profile.sql(), f, cls=DjangoJSONEncoder)
+
+        return name, queries_name
+
+
+class SlowQueryMiddleware:
+    """Record queries slower than SLOW_QUERY_THRESHOLD_MS per view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        logger = querylog.get_logger()
+        if logger is None:
+            return self.get_response(request)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(logger))
+            response = self.get_response(request)
+
+        if logger.slow:
+            match = request.resolver_match
+            view = match.view_name if match else request.path
+            try:
+                logger.flush(view)
+            except Exception:
+                log.exception('recording slow queries of %s failed', view)
+
+        return response
+
+
+class StatementTimeoutMiddleware:
+    """Bound the queries of each view and answer 503 when they overrun.
+
+    See core.deadlines for how the timeout of a view is chosen. Canceled
+    statements are counted per view in the `statement_timeouts` metric.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'postgresql':
+            return self.get_response(request)
+
+        request.statement_deadline = StatementDeadline(connection)
+        with connection.execute_wrapper(request.statement_deadline):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        deadline = getattr(request, 'statement_deadline', None)
+        if deadline is not None:
+            match = request.resolver_match
+            deadline.timeout = get_statement_timeout(
+                view_func,
+                match.view_name if match else None,
+            )
+
+    def process_exception(self, request, exception):
+        if not is_query_canceled(exception):
+            return None
+
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        record_timeout(view)
+
+        response = JsonResponse({'detail': TIMEOUT_DETAIL}, status=503)
+        response['Retry-After'] = '1'
+        return response
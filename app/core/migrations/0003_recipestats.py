@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:03
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def populate_recipe_stats(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    rows = Recipe.objects.order_by().values('user').annotate(
+        count=Count('id'),
+        price=Sum('price'),
+        time_minutes=Sum('time_minutes'),
+    )
+    RecipeStats.objects.bulk_create(
+        [
+            RecipeStats(
+                user_id=row['user'],
+                recipe_count=row['count'],
+                price_total=row['price'],
+                time_minutes_total=row['time_minutes'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_recipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to='core.user')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(
+            populate_recipe_stats,
+            migrations.RunPython.noop,
+        ),
+    ]
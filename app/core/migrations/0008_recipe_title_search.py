@@ -0,0 +1,55 @@
+from django.db import DatabaseError, migrations, transaction
+
+
+PREFIX_INDEX = (
+    'CREATE INDEX IF NOT EXISTS core_recipe_title_prefix_idx '
+    'ON core_recipe (user_id, UPPER(title::text) text_pattern_ops)'
+)
+
+TRIGRAM_INDEX = (
+    'CREATE INDEX IF NOT EXISTS core_recipe_title_trgm_idx '
+    'ON core_recipe USING gin (UPPER(title::text) gin_trgm_ops)'
+)
+
+
+def create_title_indexes(apps, schema_editor):
+    """Index titles for istartswith and, with pg_trgm, icontains."""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(PREFIX_INDEX)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(TRIGRAM_INDEX)
+    except DatabaseError:
+        """the extension needs privileges the migration user lacks"""
+        return
+
+
+def drop_title_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_title_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_title_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_indexes, drop_title_indexes),
+    ]
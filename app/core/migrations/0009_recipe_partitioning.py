@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations
+
+from core import partitioning
+
+
+def partition_recipes(apps, schema_editor):
+    """Partition an empty recipe table when RECIPE_PARTITIONS is set.
+
+    Tables holding recipes are left alone; the partition_recipes command
+    moves their rows online.
+    """
+    connection = schema_editor.connection
+    if not settings.RECIPE_PARTITIONS or connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        if partitioning.table_kind(cursor, partitioning.TABLE) \
+                == 'partitioned':
+            return
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {partitioning.TABLE})')
+        if cursor.fetchone()[0]:
+            return
+
+        partitioning.create_partitioned_table(
+            cursor,
+            settings.RECIPE_PARTITIONS,
+        )
+        partitioning.swap(cursor)
+        partitioning.drop_unpartitioned(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_title_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:01
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_partitioning'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='time_minutes',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.CheckConstraint(check=models.Q(('price__gte', 0)), name='core_recipe_price_not_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.CheckConstraint(check=models.Q(('time_minutes__gte', 0)), name='core_recipe_time_not_negative'),
+        ),
+    ]
@@ -1,8 +1,22 @@
 """
 Database models
 """
+from decimal import Decimal
+from functools import partial
+
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import EmptyResultSet
+from django.core.validators import MinValueValidator
+from django.db import (
+    IntegrityError,
+    connections,
+    models,
+    transaction,
+)
+from django.db.models import Count, F, Q, Sum, sql
+from django.utils import timezone
+
+from core.signals import recipes_changed
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -35,6 +49,28 @@ class UserManager(BaseUserManager):
             is_staff=True
         )
 
+    def purge(self, user_id, batch_size=1000):
+        """Delete a user, removing their large related tables in batches.
+
+        Each batch is a short transaction deleting at most batch_size rows
+        by primary key, so memory use and lock time stay bounded however
+        many recipes the user has. The final delete of the user itself
+        then only cascades to small tables.
+        """
+        for model in (Recipe, RecipeTombstone, Job):
+            rows = model._base_manager.using(self.db).filter(user_id=user_id)
+            while True:
+                with transaction.atomic(using=self.db):
+                    pks = list(rows.values_list('pk', flat=True)[:batch_size])
+                    if not pks:
+                        break
+                    model._base_manager.using(self.db).filter(
+                        pk__in=pks
+                    ).delete()
+
+        deleted, _ = self.filter(pk=user_id).delete()
+        return bool(deleted)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
@@ -50,6 +86,170 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes that keeps RecipeStats in step on bulk paths."""
+
+    def totals_by_user(self):
+        """Return {user_id: (count, price, time_minutes)} for the queryset."""
+        rows = self.order_by().values('user').annotate(
+            count=Count('id'),
+            price=Sum('price'),
+            time_minutes=Sum('time_minutes'),
+        )
+
+        return {
+            row['user']: (row['count'], row['price'], row['time_minutes'])
+            for row in rows
+        }
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create recipes in bulk and add them to their users' stats."""
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+
+            if kwargs.get('ignore_conflicts'):
+                """skipped rows are unknown, so recompute affected users"""
+                RecipeStats.objects.rebuild({obj.user_id for obj in objs})
+            else:
+                deltas = {}
+                for obj in objs:
+                    deltas[obj.user_id] = _add_totals(
+                        deltas.get(obj.user_id),
+                        _as_totals(obj.stats_values()),
+                    )
+                RecipeStats.objects.apply_deltas(deltas)
+
+            _notify_changes(
+                'created',
+                [(obj.pk, obj.user_id) for obj in objs if obj.pk],
+                self.db,
+            )
+
+        return objs
+
+    def _locked_rows_sql(self):
+        """Return (columns, sql, params) locking the matched recipes.
+
+        The rows are selected by primary key from the queryset as a
+        subquery, so distinct, ordering and joins of the filter do not
+        reach the FOR UPDATE. Raises EmptyResultSet if nothing can match.
+        """
+        columns = [
+            self.model._meta.get_field(name).column
+            for name in ('id', 'user', 'price', 'time_minutes')
+        ]
+        matched = self.model._base_manager.using(self.db).filter(
+            pk__in=self.values('pk')
+        ).select_for_update().order_by('pk').values_list(
+            'pk', 'user_id', 'price', 'time_minutes'
+        )
+        sql_, params = matched.query.get_compiler(self.db).as_sql()
+        return columns, sql_, params
+
+    def update(self, **kwargs):
+        """Update recipes and move the changed totals between stats.
+
+        The matched rows are locked, updated and returned with their old
+        and new values by a single statement, a FOR UPDATE CTE joined
+        into UPDATE ... RETURNING. Stats deltas and change notifications
+        therefore cover exactly the rows written, even when other rows
+        start matching the filter concurrently.
+        """
+        assert not self.query.is_sliced, \
+            'Cannot update a query once a slice has been taken.'
+        kwargs.setdefault('updated_at', timezone.now())
+        kwargs.setdefault('version', F('version') + 1)
+
+        update = self.model._base_manager.all().query.chain(sql.UpdateQuery)
+        update.add_update_values(kwargs)
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+
+        with transaction.atomic(using=self.db):
+            try:
+                columns, old_sql, old_params = self._locked_rows_sql()
+            except EmptyResultSet:
+                return 0
+            set_sql, set_params = update.get_compiler(self.db).as_sql()
+            returning = [f'old.{column}' for column in columns] + [
+                f'{table}.{column}' for column in columns[1:]
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'WITH old ({", ".join(columns)}) AS ({old_sql}) '
+                    f'{set_sql} FROM old '
+                    f'WHERE {table}.{columns[0]} = old.{columns[0]} '
+                    f'RETURNING {", ".join(returning)}',
+                    tuple(old_params) + tuple(set_params),
+                )
+                rows = cursor.fetchall()
+
+            deltas = {}
+            for _, old_user, old_price, old_time, user, price, time in rows:
+                deltas[old_user] = _add_totals(
+                    deltas.get(old_user),
+                    (-1, -old_price, -old_time),
+                )
+                deltas[user] = _add_totals(deltas.get(user), (1, price, time))
+            RecipeStats.objects.apply_deltas(deltas)
+
+            _notify_changes('updated', [row[:2] for row in rows], self.db)
+
+        self._result_cache = None
+        return len(rows)
+
+    def delete(self):
+        """Delete recipes, leave tombstones and update users' stats.
+
+        Like update, the matched rows are locked and deleted by one
+        DELETE ... USING a FOR UPDATE CTE whose RETURNING rows feed the
+        tombstones, stats deltas and notifications. Recipes have no
+        dependent rows or delete signals, so nothing needs collecting.
+        """
+        assert not self.query.is_sliced, \
+            'Cannot use \'limit\' or \'offset\' with delete.'
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        label = self.model._meta.label
+
+        with transaction.atomic(using=self.db):
+            try:
+                columns, old_sql, old_params = self._locked_rows_sql()
+            except EmptyResultSet:
+                return 0, {label: 0}
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'WITH old ({", ".join(columns)}) AS ({old_sql}) '
+                    f'DELETE FROM {table} USING old '
+                    f'WHERE {table}.{columns[0]} = old.{columns[0]} '
+                    f'RETURNING {", ".join(f"old.{c}" for c in columns)}',
+                    old_params,
+                )
+                rows = cursor.fetchall()
+
+            RecipeTombstone.objects.using(self.db).bulk_create(
+                [
+                    RecipeTombstone(recipe_id=pk, user_id=user_id)
+                    for pk, user_id, _, _ in rows
+                ],
+                batch_size=1000,
+            )
+            deltas = {}
+            for _, user, price, time in rows:
+                deltas[user] = _add_totals(
+                    deltas.get(user),
+                    (-1, -price, -time),
+                )
+            RecipeStats.objects.apply_deltas(deltas)
+            _notify_changes('deleted', [row[:2] for row in rows], self.db)
+
+        self._result_cache = None
+        return len(rows), {label: len(rows)}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Recipe(models.Model):
     """Recipe object."""
     user = models.ForeignKey(
@@ -58,12 +258,400 @@ class Recipe(models.Model):
     )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    time_minutes = models.IntegerField()
-    price = models.DecimalField(max_digits=5, decimal_places=2)
+    time_minutes = models.IntegerField(validators=[MinValueValidator(0)])
+    price = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        validators=[MinValueValidator(0)],
+    )
     link = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
 
     """Configurations"""
-    objects = models.Manager()
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_recipe_user_updated_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=Q(price__gte=0),
+                name='core_recipe_price_not_negative',
+            ),
+            models.CheckConstraint(
+                check=Q(time_minutes__gte=0),
+                name='core_recipe_time_not_negative',
+            ),
+        ]
+
+    """fields that RecipeStats is derived from"""
+    STATS_FIELDS = ('user', 'user_id', 'price', 'time_minutes')
+
+    """(user_id, price, time_minutes) as last read from or written to db"""
+    _stats_snapshot = None
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded values so saves can apply stat deltas."""
+        instance = super().from_db(db, field_names, values)
+        instance._stats_snapshot = instance.stats_values(loaded_only=True)
+
+        return instance
+
+    def stats_values(self, loaded_only=False):
+        """Return (user_id, price, time_minutes) of this recipe."""
+        if loaded_only and not {'price', 'time_minutes'} <= set(vars(self)):
+            return None
+
+        price = self._meta.get_field('price').to_python(self.price)
+        return self.user_id, price, self.time_minutes
+
+    def save(self, *args, **kwargs):
+        """Save recipe and update the owner's stats in the same transaction."""
+        adding = self._state.adding
+        if not adding:
+            self.version += 1
+
+        using = kwargs.get('using')
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            current = self.stats_values()
+            previous = self._stats_snapshot
+            if adding:
+                RecipeStats.objects.apply_deltas({
+                    current[0]: _as_totals(current)
+                })
+                _notify_changes('created', [(self.pk, current[0])], using)
+            elif previous is None:
+                RecipeStats.objects.rebuild({current[0]})
+                _notify_changes('updated', [(self.pk, current[0])], using)
+            else:
+                RecipeStats.objects.record_change(previous, current)
+                if previous[0] == current[0]:
+                    _notify_changes('updated', [(self.pk, current[0])], using)
+                else:
+                    _notify_changes('deleted', [(self.pk, previous[0])], using)
+                    _notify_changes('created', [(self.pk, current[0])], using)
+
+        self._stats_snapshot = current
+
+    def save_if_version(self, expected_version, **changes):
+        """Apply changes only if the row is still at expected_version.
+
+        Runs a single `UPDATE ... WHERE id = ? AND version = ?`, so
+        concurrent writers never overwrite each other and no row lock is
+        held. Returns False, leaving the instance untouched, on conflict.
+        """
+        if expected_version != self.version:
+            return False
+
+        now = timezone.now()
+        with transaction.atomic():
+            updated = Recipe._base_manager.filter(
+                pk=self.pk,
+                version=expected_version,
+            ).update(
+                updated_at=now,
+                version=F('version') + 1,
+                **changes,
+            )
+            if not updated:
+                return False
+
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self.updated_at = now
+            self.version = expected_version + 1
+
+            current = self.stats_values()
+            if self._stats_snapshot is None:
+                RecipeStats.objects.rebuild({current[0]})
+            else:
+                RecipeStats.objects.record_change(
+                    self._stats_snapshot,
+                    current,
+                )
+            _notify_changes('updated', [(self.pk, current[0])])
+
+        self._stats_snapshot = current
+        return True
+
+    def delete(self, *args, **kwargs):
+        """Delete recipe, leave a tombstone and update the owner's stats."""
+        with transaction.atomic(using=kwargs.get('using')):
+            previous = self._stats_snapshot or self.stats_values()
+            RecipeTombstone.objects.create(
+                recipe_id=self.pk,
+                user_id=previous[0],
+            )
+            _notify_changes(
+                'deleted',
+                [(self.pk, previous[0])],
+                kwargs.get('using'),
+            )
+            result = super().delete(*args, **kwargs)
+            RecipeStats.objects.apply_deltas({
+                previous[0]: _negate_totals(_as_totals(previous))
+            })
+
+        self._stats_snapshot = None
+        return result
+
+
+class RecipeTombstone(models.Model):
+    """Marker of a deleted recipe, read by delta sync clients."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    recipe_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    """Configurations"""
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'deleted_at'],
+                name='core_tombstone_user_del_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'deleted recipe {self.recipe_id}'
+
+
+def _notify_changes(action, owners, using=None):
+    """Send recipes_changed per user for (pk, user_id) pairs on commit."""
+    ids_by_user = {}
+    for pk, user_id in owners:
+        ids_by_user.setdefault(user_id, []).append(pk)
+
+    for user_id, ids in ids_by_user.items():
+        transaction.on_commit(
+            partial(
+                recipes_changed.send,
+                sender=Recipe,
+                user_id=user_id,
+                action=action,
+                ids=ids,
+            ),
+            using=using,
+        )
+
+
+def _as_totals(stats_values):
+    """Turn a recipe's stats_values() into a (count, price, time) tuple."""
+    return (1,) + tuple(stats_values[1:])
+
+
+def _add_totals(left, right):
+    """Add two (count, price, time_minutes) tuples, treating None as zero."""
+    left = left or (0, 0, 0)
+    right = right or (0, 0, 0)
+
+    return tuple((a or 0) + (b or 0) for a, b in zip(left, right))
+
+
+def _negate_totals(totals):
+    """Negate a (count, price, time_minutes) tuple."""
+    if totals is None:
+        return None
+
+    return tuple(-(value or 0) for value in totals)
+
+
+class RecipeStatsManager(models.Manager):
+    """Manager for per-user recipe stats."""
+
+    def apply_deltas(self, deltas):
+        """Add {user_id: (count, price, time_minutes)} to the stored totals."""
+        for user_id, (count, price, time_minutes) in deltas.items():
+            if not (count or price or time_minutes):
+                continue
+
+            changes = {
+                'recipe_count': F('recipe_count') + count,
+                'price_total': F('price_total') + price,
+                'time_minutes_total': F('time_minutes_total') + time_minutes,
+            }
+            if self.filter(user_id=user_id).update(**changes):
+                continue
+
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(
+                        user_id=user_id,
+                        recipe_count=count,
+                        price_total=price,
+                        time_minutes_total=time_minutes,
+                    )
+            except IntegrityError:
+                """another request created the row first"""
+                self.filter(user_id=user_id).update(**changes)
+
+    def record_change(self, previous, current):
+        """Apply the difference between two recipe stats_values()."""
+        if previous == current:
+            return
+
+        if previous[0] == current[0]:
+            self.apply_deltas({
+                current[0]: (
+                    0,
+                    current[1] - previous[1],
+                    current[2] - previous[2],
+                )
+            })
+        else:
+            self.apply_deltas({
+                previous[0]: _negate_totals(_as_totals(previous)),
+                current[0]: _as_totals(current),
+            })
+
+    def compute(self, user_ids):
+        """Return the actual {user_id: (count, price, time)} from recipes."""
+        return Recipe.objects.filter(user__in=user_ids).totals_by_user()
+
+    def rebuild(self, user_ids):
+        """Recompute stored stats for the given users from their recipes."""
+        user_ids = list(user_ids)
+        with transaction.atomic(using=self.db):
+            list(self.select_for_update().filter(user_id__in=user_ids))
+            actual = self.compute(user_ids)
+
+            for user_id in user_ids:
+                count, price, time_minutes = _add_totals(
+                    actual.get(user_id),
+                    None,
+                )
+                self.update_or_create(
+                    user_id=user_id,
+                    defaults={
+                        'recipe_count': count,
+                        'price_total': price,
+                        'time_minutes_total': time_minutes,
+                    },
+                )
+
+
+class RecipeStats(models.Model):
+    """Running recipe totals of a user, maintained on every recipe write."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_stats'
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    time_minutes_total = models.BigIntegerField(default=0)
+
+    """Configurations"""
+    objects = RecipeStatsManager()
+
+    def __str__(self):
+        return f'recipe stats of user {self.user_id}'
+
+    @property
+    def average_price(self):
+        """Average recipe price, or None when the user has no recipes."""
+        if not self.recipe_count:
+            return None
+
+        return (self.price_total / self.recipe_count).quantize(Decimal('0.01'))
+
+    @property
+    def average_time_minutes(self):
+        """Average recipe time, or None when the user has no recipes."""
+        if not self.recipe_count:
+            return None
+
+        return round(self.time_minutes_total / self.recipe_count, 2)
+
+
+class Job(models.Model):
+    """Background job waiting for or handled by a `run_jobs` worker."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    """Fields"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    """Configurations"""
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_after', 'id'],
+                name='core_job_queued_idx',
+                condition=Q(status='queued'),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class SlowQuery(models.Model):
+    """Totals of a slow SQL statement run by one view."""
+    fingerprint = models.CharField(max_length=40)
+    view = models.CharField(max_length=255)
+    sql = models.TextField()
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    """Configurations"""
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fingerprint', 'view'],
+                name='core_slowquery_unique_fingerprint_view',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.view}: {self.sql[:80]}'
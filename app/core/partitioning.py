@@ -0,0 +1,251 @@
+"""
+Hash partitioning of the recipe table by user_id on Postgres.
+
+The partitioned copy `core_recipe_partitioned` mirrors the columns,
+defaults, checks, foreign keys and indexes of `core_recipe`, with the
+primary key widened to (id, user_id) as Postgres requires the partition
+key in unique constraints. While existing rows are copied in batches a
+trigger on `core_recipe` replays every write onto the copy, so the
+application keeps running. `swap` then renames the copy into place under
+a short exclusive lock. The ORM model is unchanged: the id sequence is
+reused and queries filtered by user only touch one partition.
+"""
+import re
+
+
+TABLE = 'core_recipe'
+PARTITIONED = 'core_recipe_partitioned'
+UNPARTITIONED = 'core_recipe_unpartitioned'
+TRIGGER = 'core_recipe_mirror'
+
+INDEX_DEF = re.compile(
+    r'^CREATE INDEX (?P<name>\S+) ON (?:\S+\.)?core_recipe (?P<rest>.*)$'
+)
+
+
+class PartitioningError(Exception):
+    """The recipe table cannot be partitioned as requested."""
+
+
+def table_kind(cursor, table):
+    """Return 'partitioned', 'table' or None if table does not exist."""
+    cursor.execute(
+        'SELECT relkind FROM pg_class '
+        'WHERE oid = to_regclass(%s)',
+        [table],
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    return 'partitioned' if row[0] == 'p' else 'table'
+
+
+def partition_name(remainder):
+    """Return the table name of a partition."""
+    return f'{TABLE}_p{remainder}'
+
+
+def temporary_name(name):
+    """Return the name an object of the copy has until the swap."""
+    return f'p_{name}'[:63]
+
+
+def old_name(name):
+    """Return the name an object of the old table gets at the swap."""
+    return f'{name[:59]}_old'
+
+
+def get_indexes(cursor, table):
+    """Return [(name, definition)] of non-primary indexes of table."""
+    cursor.execute(
+        'SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique '
+        'FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE i.indrelid = %s::regclass AND NOT i.indisprimary '
+        'ORDER BY c.relname',
+        [table],
+    )
+    indexes = []
+    for name, definition, unique in cursor.fetchall():
+        if unique:
+            raise PartitioningError(
+                f'Unique index {name} does not include user_id.'
+            )
+        indexes.append((name, definition))
+
+    return indexes
+
+
+def get_foreign_keys(cursor, table):
+    """Return [(name, definition)] of foreign keys of table."""
+    cursor.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = %s::regclass AND contype = 'f' "
+        'ORDER BY conname',
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def create_partitioned_table(cursor, partitions):
+    """Create the empty partitioned copy of the recipe table."""
+    if partitions < 2:
+        raise PartitioningError('At least 2 partitions are needed.')
+
+    cursor.execute(
+        f'CREATE TABLE {PARTITIONED} (LIKE {TABLE} INCLUDING DEFAULTS '
+        f'INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+        f'PARTITION BY HASH (user_id)'
+    )
+    cursor.execute(
+        f'ALTER TABLE {PARTITIONED} ADD CONSTRAINT {PARTITIONED}_pkey '
+        f'PRIMARY KEY (id, user_id)'
+    )
+    for remainder in range(partitions):
+        cursor.execute(
+            f'CREATE TABLE {partition_name(remainder)} '
+            f'PARTITION OF {PARTITIONED} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+
+    for name, definition in get_foreign_keys(cursor, TABLE):
+        cursor.execute(
+            f'ALTER TABLE {PARTITIONED} ADD CONSTRAINT {name} {definition}'
+        )
+    for name, definition in get_indexes(cursor, TABLE):
+        match = INDEX_DEF.match(definition)
+        if match is None:
+            raise PartitioningError(f'Cannot copy index {name}.')
+        cursor.execute(
+            f'CREATE INDEX {temporary_name(name)} ON {PARTITIONED} '
+            f'{match.group("rest")}'
+        )
+
+
+def install_mirror(cursor):
+    """Replay writes to the recipe table onto the partitioned copy."""
+    cursor.execute(f'''
+        CREATE OR REPLACE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {PARTITIONED}
+                WHERE id = OLD.id AND user_id = OLD.user_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {PARTITIONED} SELECT NEW.*;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    cursor.execute(f'DROP TRIGGER IF EXISTS {TRIGGER} ON {TABLE}')
+    cursor.execute(
+        f'CREATE TRIGGER {TRIGGER} AFTER INSERT OR UPDATE OR DELETE '
+        f'ON {TABLE} FOR EACH ROW EXECUTE FUNCTION {TRIGGER}()'
+    )
+
+
+def remove_mirror(cursor):
+    """Stop replaying writes onto the partitioned copy."""
+    cursor.execute(f'DROP TRIGGER IF EXISTS {TRIGGER} ON {TABLE}')
+    cursor.execute(f'DROP FUNCTION IF EXISTS {TRIGGER}()')
+
+
+def id_range(cursor):
+    """Return (min id, max id) of the recipe table, or (None, None)."""
+    cursor.execute(f'SELECT min(id), max(id) FROM {TABLE}')
+    return cursor.fetchone()
+
+
+def copy_batch(cursor, first_id, last_id):
+    """Copy rows with ids in [first_id, last_id] not yet mirrored.
+
+    Source rows are share-locked so a concurrent delete either happens
+    before the copy, and the row is skipped, or after it, and the
+    trigger removes the copied row.
+    """
+    cursor.execute(
+        f'INSERT INTO {PARTITIONED} '
+        f'SELECT * FROM {TABLE} WHERE id BETWEEN %s AND %s FOR SHARE '
+        f'ON CONFLICT DO NOTHING',
+        [first_id, last_id],
+    )
+    return cursor.rowcount
+
+
+def verify_batch(cursor, first_id, last_id):
+    """Return how many rows with ids in [first_id, last_id] differ.
+
+    Rows are compared in both directions within one statement, so while
+    the mirror is active both tables are seen at the same point in time.
+    """
+    cursor.execute(
+        f'SELECT count(*) FROM ('
+        f'(SELECT * FROM {TABLE} WHERE id BETWEEN %s AND %s '
+        f'EXCEPT ALL '
+        f'SELECT * FROM {PARTITIONED} WHERE id BETWEEN %s AND %s) '
+        f'UNION ALL '
+        f'(SELECT * FROM {PARTITIONED} WHERE id BETWEEN %s AND %s '
+        f'EXCEPT ALL '
+        f'SELECT * FROM {TABLE} WHERE id BETWEEN %s AND %s)'
+        f') AS difference',
+        [first_id, last_id] * 4,
+    )
+    return cursor.fetchone()[0]
+
+
+def mirror_installed(cursor):
+    """Return whether writes are being replayed onto the copy."""
+    cursor.execute(
+        'SELECT 1 FROM pg_trigger '
+        'WHERE tgrelid = to_regclass(%s) AND tgname = %s',
+        [TABLE, TRIGGER],
+    )
+    return cursor.fetchone() is not None
+
+
+def swap(cursor, verified_id=None):
+    """Put the partitioned copy in place of the recipe table.
+
+    Rows up to `verified_id` must have been compared with `verify_batch`
+    while the mirror was active; under the exclusive lock only the mirror
+    and the rows above it are checked. Must run in a transaction; the old
+    table stays as core_recipe_unpartitioned until dropped.
+    """
+    cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+    if not mirror_installed(cursor):
+        raise PartitioningError('Writes are not mirrored; copy again.')
+    cursor.execute(
+        f'SELECT (SELECT count(*) FROM {TABLE} WHERE id > %s), '
+        f'(SELECT count(*) FROM {PARTITIONED} WHERE id > %s)',
+        [verified_id or 0] * 2,
+    )
+    expected, copied = cursor.fetchone()
+    if expected != copied:
+        raise PartitioningError(
+            f'{copied} of {expected} new recipes were copied; copy again.'
+        )
+
+    remove_mirror(cursor)
+    indexes = [name for name, _ in get_indexes(cursor, TABLE)]
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED}')
+    cursor.execute(
+        f'ALTER TABLE {UNPARTITIONED} '
+        f'RENAME CONSTRAINT {TABLE}_pkey TO {UNPARTITIONED}_pkey'
+    )
+    for name in indexes:
+        cursor.execute(f'ALTER INDEX {name} RENAME TO {old_name(name)}')
+
+    cursor.execute(f'ALTER TABLE {PARTITIONED} RENAME TO {TABLE}')
+    cursor.execute(
+        f'ALTER TABLE {TABLE} '
+        f'RENAME CONSTRAINT {PARTITIONED}_pkey TO {TABLE}_pkey'
+    )
+    for name in indexes:
+        cursor.execute(f'ALTER INDEX {temporary_name(name)} RENAME TO {name}')
+    cursor.execute(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+
+
+def drop_unpartitioned(cursor):
+    """Drop the table left behind by swap."""
+    cursor.execute(f'DROP TABLE IF EXISTS {UNPARTITIONED}')
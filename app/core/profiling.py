@@ -0,0 +1,97 @@
+"""
+Helpers for profiling single requests.
+"""
+import cProfile
+import marshal
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+
+class QueryRecorder:
+    """Database execute wrapper that records SQL and its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'many': many,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+    @property
+    def total_ms(self):
+        """Total time spent executing the recorded queries."""
+        return sum(query['duration_ms'] for query in self.queries)
+
+
+class RequestProfile:
+    """Run a callable under cProfile while recording its queries."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.recorder = QueryRecorder()
+        self.duration_ms = None
+
+    def run(self, func, *args):
+        """Call func(*args) profiled and return its result."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.recorder))
+
+            started = time.perf_counter()
+            self.profiler.enable()
+            try:
+                return func(*args)
+            finally:
+                self.profiler.disable()
+                self.duration_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self):
+        """Return the profile as pstats.Stats."""
+        return pstats.Stats(self.profiler)
+
+    def dump(self):
+        """Return the profile in the binary pstats format."""
+        return marshal.dumps(self.stats().stats)
+
+    def sql(self):
+        """Return the recorded queries and their timings."""
+        return {
+            'duration_ms': self.duration_ms,
+            'query_count': len(self.recorder.queries),
+            'query_ms': self.recorder.total_ms,
+            'queries': self.recorder.queries,
+        }
+
+    def summary(self, limit=30):
+        """Return top functions by cumulative time and all queries."""
+        stats = self.stats().stats
+        rows = sorted(
+            stats.items(),
+            key=lambda item: item[1][3],
+            reverse=True,
+        )[:limit]
+
+        return {
+            **self.sql(),
+            'functions': [
+                {
+                    'function': f'{filename}:{line}({name})',
+                    'calls': calls,
+                    'total_ms': total_time * 1000,
+                    'cumulative_ms': cumulative_time * 1000,
+                }
+                for (filename, line, name), (
+                    _, calls, total_time, cumulative_time, _
+                ) in rows
+            ],
+        }
@@ -0,0 +1,139 @@
+"""
+Slow query log.
+
+`SlowQueryLogger` is installed as a database execute wrapper around each
+request by `core.middleware.SlowQueryMiddleware`. Queries slower than
+SLOW_QUERY_THRESHOLD_MS are normalized into a fingerprint and added to the
+SlowQuery totals of the view that ran them; a SLOW_QUERY_EXPLAIN_RATE
+sample of SELECTs also stores its EXPLAIN plan.
+"""
+import hashlib
+import random
+import re
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import SlowQuery
+
+
+IN_LIST = re.compile(r'\bIN \((?:\s*%s\s*,)*\s*%s\s*\)', re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Return sql with literals and parameters replaced by `?`."""
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    """Return a stable identifier of a normalized statement."""
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+class SlowQueryLogger:
+    """Execute wrapper collecting the slow queries of one request."""
+
+    def __init__(self, threshold_ms, explain_rate):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= self.threshold_ms:
+                explain = (
+                    not many
+                    and sql.lstrip().upper().startswith('SELECT')
+                    and random.random() < self.explain_rate
+                )
+                self.slow.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'params': params if explain else None,
+                    'duration_ms': duration_ms,
+                })
+
+    def flush(self, view):
+        """Add the collected queries to the SlowQuery totals of view."""
+        for query in self.slow:
+            normalized = normalize(query['sql'])
+            plan = ''
+            if query['params'] is not None:
+                plan = explain(query['alias'], query['sql'], query['params'])
+
+            record(view, normalized, query['duration_ms'], plan)
+
+        self.slow = []
+
+
+def explain(alias, sql, params):
+    """Return the plan of sql without running it."""
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE off) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+def record(view, normalized_sql, duration_ms, plan=''):
+    """Add one execution of a slow statement to its totals."""
+    key = fingerprint(normalized_sql)
+    changes = {
+        'calls': F('calls') + 1,
+        'total_ms': F('total_ms') + duration_ms,
+        'max_ms': Greatest('max_ms', duration_ms),
+        'last_seen': timezone.now(),
+    }
+    if plan:
+        changes['plan'] = plan
+
+    queries = SlowQuery.objects.filter(fingerprint=key, view=view)
+    if not queries.update(**changes):
+        _, created = SlowQuery.objects.get_or_create(
+            fingerprint=key,
+            view=view,
+            defaults={
+                'sql': normalized_sql,
+                'calls': 1,
+                'total_ms': duration_ms,
+                'max_ms': duration_ms,
+                'plan': plan,
+            },
+        )
+        if not created:
+            queries.update(**changes)
+
+
+def get_logger():
+    """Return a logger configured from settings, or None if disabled."""
+    if settings.SLOW_QUERY_THRESHOLD_MS is None:
+        return None
+
+    return SlowQueryLogger(
+        settings.SLOW_QUERY_THRESHOLD_MS,
+        settings.SLOW_QUERY_EXPLAIN_RATE,
+    )
@@ -0,0 +1,373 @@
+"""
+Pre-forking WSGI server used by the `serve` management command.
+
+The master process imports and warms the application, binds the listening
+socket and forks workers, so the loaded code is shared copy-on-write. Each
+worker accepts connections on the shared socket and exits after a number
+of requests or once it grows past a memory ceiling; the master replaces
+exited workers. A worker handles up to `threads` connections at once, so
+identical concurrent requests can share work (see core.singleflight).
+Connections that stall for `timeout` seconds are closed, so a slow or
+idle client cannot hold a thread. SIGHUP gracefully recycles all workers
+and SIGTERM/SIGINT drain them before exiting.
+"""
+import os
+import queue
+import random
+import resource
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.db import connections
+
+from core import writebehind
+
+
+def default_worker_count():
+    """Return the number of CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def current_memory_mb():
+    """Return the resident memory of this process in megabytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        """ru_maxrss is the peak in kilobytes on Linux"""
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Request handler that logs to the worker's stream."""
+
+    def setup(self):
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def handle(self):
+        try:
+            super().handle()
+        except socket.timeout:
+            self.close_connection = True
+            self.log_message('request timed out after %ss', self.timeout)
+
+    def log_message(self, format, *args):
+        self.server.log(f'{self.address_string()} - {format % args}')
+
+
+class WorkerServer(WSGIServer):
+    """WSGIServer accepting on a socket inherited from the master."""
+
+    def __init__(self, listener, application, log, request_timeout=None):
+        super().__init__(
+            listener.getsockname()[:2],
+            RequestHandler,
+            bind_and_activate=False,
+        )
+        self.socket.close()
+        self.socket = listener
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+        self.setup_environ()
+        self.set_app(application)
+        self.log = log
+        self.request_timeout = request_timeout
+
+
+class Worker:
+    """Serve requests from the shared socket until recycled or stopped."""
+
+    def __init__(self, listener, application, max_requests=0,
+                 max_memory_mb=0, timeout=None, threads=1, log=print):
+        self.server = WorkerServer(listener, application, log, timeout)
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_memory_mb = max_memory_mb
+        self.log = log
+        self.handled = 0
+        self.stopping = False
+
+    def stop(self, signum=None, frame=None):
+        """Finish the request in progress, then exit."""
+        self.stopping = True
+
+    def should_recycle(self):
+        """Return why this worker should exit, or None to keep serving."""
+        if self.max_requests and self.handled >= self.max_requests:
+            return f'served {self.handled} requests'
+        if self.max_memory_mb and current_memory_mb() > self.max_memory_mb:
+            return f'exceeded {self.max_memory_mb} MB'
+
+        return None
+
+    def serve(self, poll_interval=0.5):
+        """Accept connections and handle up to `threads` at a time."""
+        listener = self.server.socket
+        listener.setblocking(False)
+        pool = None
+        if self.threads > 1:
+            pool = RequestPool(self.handle, self.threads)
+
+        try:
+            while not self.stopping:
+                reason = self.should_recycle()
+                if reason:
+                    self.log(f'worker {os.getpid()} recycling: {reason}')
+                    break
+
+                """leave connections to other workers while threads are busy"""
+                if pool is not None and not pool.slots.acquire(
+                    timeout=poll_interval
+                ):
+                    continue
+
+                accepted = self.accept(listener, poll_interval)
+                if accepted is None:
+                    if pool is not None:
+                        pool.slots.release()
+                    continue
+
+                self.handled += 1
+                if pool is None:
+                    self.handle(*accepted)
+                else:
+                    pool.submit(*accepted)
+        finally:
+            if pool is not None:
+                pool.join()
+
+        """os._exit skips atexit, so flush buffered writes here"""
+        writebehind.flush_all()
+        connections.close_all()
+
+    def accept(self, listener, poll_interval):
+        """Return (request, client_address) of a new connection, or None."""
+        try:
+            readable, _, _ = select.select([listener], [], [], poll_interval)
+        except InterruptedError:
+            return None
+        if not readable:
+            return None
+
+        try:
+            request, client_address = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            """another worker took the connection"""
+            return None
+
+        request.setblocking(True)
+        return request, client_address
+
+    def handle(self, request, client_address):
+        """Serve the requests of one connection and close it."""
+        if self.server.verify_request(request, client_address):
+            try:
+                self.server.process_request(request, client_address)
+            except Exception:
+                self.server.handle_error(request, client_address)
+                self.server.shutdown_request(request)
+        else:
+            self.server.shutdown_request(request)
+
+
+class RequestPool:
+    """Threads of a worker handling accepted connections concurrently.
+
+    `slots` counts idle threads; the worker takes one before accepting
+    and the thread gives it back once the connection is closed. Each
+    thread closes its own database connections when the pool is joined.
+    """
+
+    def __init__(self, handle, size):
+        self.handle = handle
+        self.slots = threading.BoundedSemaphore(size)
+        self.queue = queue.SimpleQueue()
+        self.threads = [
+            threading.Thread(target=self.run, name=f'request-{index}')
+            for index in range(size)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, request, client_address):
+        """Hand an accepted connection to an idle thread."""
+        self.queue.put((request, client_address))
+
+    def run(self):
+        try:
+            while True:
+                accepted = self.queue.get()
+                if accepted is None:
+                    return
+                try:
+                    self.handle(*accepted)
+                finally:
+                    self.slots.release()
+        finally:
+            connections.close_all()
+
+    def join(self):
+        """Finish the connections in progress and stop the threads."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+class PreforkServer:
+    """Master process that keeps a pool of forked workers running."""
+
+    def __init__(self, application, host, port, workers, max_requests=0,
+                 max_requests_jitter=0, max_memory_mb=0,
+                 graceful_timeout=30, timeout=30, threads=1, backlog=2048,
+                 log=print):
+        self.application = application
+        self.address = (host, port)
+        self.worker_count = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_memory_mb = max_memory_mb
+        self.graceful_timeout = graceful_timeout
+        self.timeout = timeout
+        self.threads = threads
+        self.backlog = backlog
+        self.log = log
+        self.workers = {}
+        self.draining = set()
+        self.stopping = False
+        self.reloading = False
+
+    def run(self):
+        """Bind the socket and supervise workers until told to stop."""
+        family = socket.AF_INET6 if ':' in self.address[0] else socket.AF_INET
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(self.address)
+        self.listener.listen(self.backlog)
+
+        """workers must not share the master's database connections"""
+        connections.close_all()
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        self.log(
+            f'master {os.getpid()} listening on {self.address[0]}:'
+            f'{self.address[1]} with {self.worker_count} workers'
+        )
+
+        try:
+            while not self.stopping:
+                if self.reloading:
+                    self.reloading = False
+                    self.recycle_workers()
+                self.reap_workers()
+                while len(self.workers) < self.worker_count:
+                    self.spawn_worker()
+                time.sleep(0.5)
+        finally:
+            self.stop_workers()
+            self.listener.close()
+
+        self.log(f'master {os.getpid()} stopped')
+
+    def handle_stop(self, signum, frame):
+        """Leave the supervise loop and drain workers."""
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        """Recycle all workers on the next supervise tick."""
+        self.reloading = True
+
+    def spawn_worker(self):
+        """Fork a new worker process."""
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+
+        exit_code = 0
+        try:
+            worker = Worker(
+                self.listener,
+                self.application,
+                max_requests=max_requests,
+                max_memory_mb=self.max_memory_mb,
+                timeout=self.timeout,
+                threads=self.threads,
+                log=self.log,
+            )
+            signal.signal(signal.SIGTERM, worker.stop)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+            worker.serve()
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def reap_workers(self):
+        """Forget workers that exited."""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if not pid:
+                return
+            self.workers.pop(pid, None)
+            self.draining.discard(pid)
+
+    def recycle_workers(self):
+        """Start a fresh set of workers and drain the old ones."""
+        old = list(self.workers)
+        self.log(f'reloading {len(old)} workers')
+        self.draining.update(old)
+        self.workers = {}
+        for _ in range(self.worker_count):
+            self.spawn_worker()
+        self.signal_workers(old, signal.SIGTERM)
+
+    def signal_workers(self, pids, signum):
+        """Send signum to each of pids that is still running."""
+        for pid in list(pids):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop_workers(self):
+        """Ask workers to finish, then kill those past the timeout."""
+        self.draining.update(self.workers)
+        self.workers = {}
+        self.signal_workers(self.draining, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+
+        while time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid:
+                self.draining.discard(pid)
+            else:
+                time.sleep(0.1)
+
+        self.log(f'killing {len(self.draining)} workers past the timeout')
+        self.signal_workers(self.draining, signal.SIGKILL)
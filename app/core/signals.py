@@ -0,0 +1,10 @@
+"""
+Signals of the core app.
+"""
+from django.dispatch import Signal
+
+
+"""Sent once the writing transaction commits, for single and bulk recipe
+writes alike, with `user_id`, `action` ('created', 'updated' or
+'deleted') and the `ids` of the recipes of that user."""
+recipes_changed = Signal()
@@ -0,0 +1,111 @@
+"""
+Coalescing of identical concurrent calls within a process.
+
+When several threads ask for the same key at once, the first runs the
+computation and the others wait for it and share its result instead of
+repeating the same queries and serialization. A waiter that is not
+served within the timeout, or whose leader failed, computes the result
+itself. Results are only shared between calls that overlap in time;
+nothing is cached afterwards.
+"""
+import threading
+from collections import Counter, OrderedDict
+
+from rest_framework.response import Response
+
+from core import metrics
+
+
+class _Call:
+    """A computation in flight and the threads waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """Share the result of one in-flight call per key with its waiters.
+
+    Outcomes are counted in the `single_flight` metric per flight and,
+    for the `max_keys` most recently used keys, in `stats`.
+    """
+
+    def __init__(self, name, timeout, max_keys=1000):
+        self.name = name
+        self.timeout = timeout
+        self.max_keys = max_keys
+        self.calls = {}
+        self.stats = OrderedDict()
+        self.lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """Return function(*args, **kwargs), or the in-flight result."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.timeout) and not call.failed:
+                self.count(key, 'shared')
+                return call.result
+            self.count(key, 'timeout' if not call.done.is_set() else 'failed')
+            return function(*args, **kwargs)
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+            call.done.set()
+
+        self.count(key, 'leader')
+        return call.result
+
+    def forget(self, match):
+        """Make later calls for keys where match(key) start a new flight.
+
+        Calls already waiting still get the in-flight result; use this
+        when the data it was read from changed, so no caller that starts
+        after the change is served the older read.
+        """
+        with self.lock:
+            for key in [key for key in self.calls if match(key)]:
+                del self.calls[key]
+
+    def count(self, key, outcome):
+        """Record outcome of a call for key."""
+        metrics.increment('single_flight', flight=self.name, outcome=outcome)
+        with self.lock:
+            stats = self.stats.pop(key, None) or Counter()
+            stats[outcome] += 1
+            self.stats[key] = stats
+            while len(self.stats) > self.max_keys:
+                self.stats.popitem(last=False)
+
+
+def coalesce_response(flight, key, view_method, request, *args, **kwargs):
+    """Run a DRF view method once for concurrent identical requests.
+
+    Waiters get a new Response with the leader's serialized data and
+    status, so each request is still negotiated and rendered on its own.
+    """
+    own = []
+
+    def respond():
+        response = view_method(request, *args, **kwargs)
+        own.append(response)
+        return response.data, response.status_code
+
+    data, status = flight.do(key, respond)
+    if own:
+        return own[0]
+
+    return Response(data, status=status)
@@ -0,0 +1,68 @@
+"""
+Helpers for measuring and shortening process start up.
+"""
+import re
+
+from django.apps import apps
+from django.urls import get_resolver
+
+
+IMPORTTIME_LINE = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| '
+    r'(?P<indent>\s*)(?P<module>\S+)$'
+)
+
+
+def parse_importtime(output):
+    """Parse `python -X importtime` output into a list of module dicts.
+
+    Each dict holds the module name, its nesting depth and its self and
+    cumulative import time in milliseconds.
+    """
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+
+        modules.append({
+            'module': match.group('module'),
+            'depth': len(match.group('indent')) // 2,
+            'self_ms': int(match.group('self')) / 1000,
+            'cumulative_ms': int(match.group('cumulative')) / 1000,
+        })
+
+    return modules
+
+
+META_CACHES = (
+    'fields',
+    'concrete_fields',
+    'local_concrete_fields',
+    'many_to_many',
+    'related_objects',
+    'fields_map',
+    '_forward_fields_map',
+    'db_returning_fields',
+)
+
+
+def warm_up():
+    """Fill process-wide caches before serving traffic.
+
+    Builds the URL resolver's reverse maps and the cached field lookups
+    of every model's _meta, which queries, model instances and DRF's
+    ModelSerializer field discovery read on each request. Both live for
+    the whole process, so in a pre-forking server they are filled once
+    and shared. Serializers themselves are rebuilt per request and are
+    not warmed. No database connection is opened.
+    """
+    get_resolver().reverse_dict
+
+    models = apps.get_models()
+    for model in models:
+        model._meta.get_fields()
+        for name in META_CACHES:
+            getattr(model._meta, name)
+
+    return models
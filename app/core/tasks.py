@@ -0,0 +1,51 @@
+"""
+Background jobs of the core app.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.jobs import job
+from core.models import RecipeStats, RecipeTombstone
+
+
+STATS_BATCH_SIZE = 500
+
+
+@job('core.rebuild_recipe_stats')
+def rebuild_recipe_stats(job):
+    """Rebuild recipe stats of payload `user_ids`, or of every user."""
+    user_ids = job.payload.get('user_ids')
+    if user_ids is None:
+        user_ids = get_user_model().objects.order_by('pk').values_list(
+            'pk',
+            flat=True
+        )
+
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), STATS_BATCH_SIZE):
+        RecipeStats.objects.rebuild(user_ids[start:start + STATS_BATCH_SIZE])
+
+    return {'users': len(user_ids)}
+
+
+@job('core.prune_recipe_tombstones', every=timedelta(days=1))
+def prune_recipe_tombstones(job):
+    """Delete tombstones older than SYNC_TOMBSTONE_DAYS."""
+    oldest = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _ = RecipeTombstone.objects.filter(deleted_at__lt=oldest).delete()
+
+    return {'deleted': deleted}
+
+
+@job('core.purge_user')
+def purge_user(job):
+    """Delete payload `user_id` and their data in batches."""
+    deleted = get_user_model().objects.purge(
+        job.payload['user_id'],
+        batch_size=settings.USER_PURGE_BATCH_SIZE,
+    )
+
+    return {'deleted': deleted}
@@ -1,10 +1,11 @@
 """Tests for Django admin modifications"""
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
 
+@override_settings(LAST_LOGIN_WRITE_BEHIND=False)
 class AdminSiteTests(TestCase):
     """Tests Django admin."""
 
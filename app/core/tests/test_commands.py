@@ -1,11 +1,21 @@
 """
 Test custom Django management commands.
 """
+import re
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, skipUnlessDBFeature
+
+from core import partitioning
+from core.models import Recipe, RecipeStats
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -31,3 +41,218 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class RebuildRecipeStatsCommandTests(TestCase):
+    """Test the rebuild_recipe_stats command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='test recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+
+    def test_verify_reports_wrong_stats(self):
+        """Test --verify fails when stored stats drifted"""
+        RecipeStats.objects.filter(user=self.user).update(recipe_count=7)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_recipe_stats',
+                verify=True,
+                stdout=StringIO()
+            )
+
+    def test_rebuild_fixes_wrong_stats(self):
+        """Test rebuilding restores stats from recipes"""
+        RecipeStats.objects.all().delete()
+
+        call_command('rebuild_recipe_stats', batch_size=1, stdout=StringIO())
+
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.recipe_count, 1)
+        self.assertEqual(stats.price_total, Decimal('5.00'))
+        self.assertEqual(stats.time_minutes_total, 10)
+        call_command('rebuild_recipe_stats', verify=True, stdout=StringIO())
+
+
+class ImportUsersCommandTests(TestCase):
+    """Test the import_users command"""
+
+    def test_import_users_skips_existing_emails(self):
+        """Test users are created in batches and duplicates skipped"""
+        get_user_model().objects.create_user(
+            email='taken@example.com',
+            password='pass1234'
+        )
+        rows = (
+            'email,name,password\n'
+            'new1@example.com,New One,pass1234\n'
+            'taken@example.com,Taken,pass1234\n'
+            'new2@example.com,New Two,\n'
+            'new3@example.com,New Three,pass1234\n'
+        )
+        out = StringIO()
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as csv_file:
+            csv_file.write(rows)
+            csv_file.flush()
+            call_command(
+                'import_users',
+                csv_file.name,
+                batch_size=2,
+                stdout=out
+            )
+
+        self.assertIn('Created 3 users, skipped 1', out.getvalue())
+        new_user = get_user_model().objects.get(email='new1@example.com')
+        self.assertEqual(new_user.name, 'New One')
+        self.assertTrue(new_user.check_password('pass1234'))
+        self.assertFalse(
+            get_user_model().objects.get(
+                email='new2@example.com'
+            ).has_usable_password()
+        )
+
+
+@skipUnlessDBFeature('is_postgresql_11')
+class PartitionRecipesCommandTests(TestCase):
+    """Test moving recipes into a hash partitioned table"""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                f'user{number}@example.com',
+                'pass1234'
+            )
+            for number in range(3)
+        ]
+        for user in self.users:
+            for number in range(3):
+                Recipe.objects.create(
+                    user=user,
+                    title=f'recipe {number}',
+                    time_minutes=10,
+                    price=Decimal('2.50'),
+                )
+        with connection.cursor() as cursor:
+            self.partitioned = partitioning.table_kind(
+                cursor,
+                partitioning.TABLE
+            ) == 'partitioned'
+
+    def partition(self, *args):
+        """Run the command and return its output."""
+        out = StringIO()
+        call_command(
+            'partition_recipes',
+            '--partitions=4',
+            '--batch-size=2',
+            *args,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_partition_keeps_recipes(self):
+        """Test rows, ids and writes survive the move."""
+        if self.partitioned:
+            self.skipTest('recipes were partitioned by migrations')
+        before = list(Recipe.objects.order_by('id').values())
+
+        self.partition()
+
+        with connection.cursor() as cursor:
+            kind = partitioning.table_kind(cursor, partitioning.TABLE)
+        self.assertEqual(kind, 'partitioned')
+        self.assertEqual(list(Recipe.objects.order_by('id').values()), before)
+
+        recipe = Recipe.objects.create(
+            user=self.users[0],
+            title='new',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        self.assertGreater(recipe.id, before[-1]['id'])
+        recipe.title = 'renamed'
+        recipe.save()
+        recipe.delete()
+        self.assertEqual(Recipe.objects.count(), len(before))
+
+    def test_writes_during_copy_are_mirrored(self):
+        """Test writes between copy and swap reach the partitioned table."""
+        if self.partitioned:
+            self.skipTest('recipes were partitioned by migrations')
+        self.partition('--no-swap')
+
+        first = Recipe.objects.filter(user=self.users[0]).first()
+        first.delete()
+        Recipe.objects.filter(user=self.users[1]).update(time_minutes=99)
+        Recipe.objects.create(
+            user=self.users[2],
+            title='late',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        expected = list(Recipe.objects.order_by('id').values())
+
+        output = self.partition()
+
+        self.assertIn('Recipes are partitioned.', output)
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values()),
+            expected
+        )
+
+    def test_diverged_copy_not_swapped(self):
+        """Test rows differing from the copy stop the command."""
+        if self.partitioned:
+            self.skipTest('recipes were partitioned by migrations')
+        self.partition('--no-swap')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {partitioning.PARTITIONED} SET time_minutes = 1 '
+                f'WHERE id = %s',
+                [Recipe.objects.order_by('id').last().id],
+            )
+
+        with self.assertRaisesMessage(CommandError, 'differ from the copy'):
+            self.partition()
+
+        with connection.cursor() as cursor:
+            kind = partitioning.table_kind(cursor, partitioning.TABLE)
+        self.assertEqual(kind, 'table')
+
+    def test_swap_needs_mirror(self):
+        """Test swap refuses a copy that writes no longer reach."""
+        if self.partitioned:
+            self.skipTest('recipes were partitioned by migrations')
+        self.partition('--no-swap')
+
+        with connection.cursor() as cursor:
+            partitioning.remove_mirror(cursor)
+            with self.assertRaises(partitioning.PartitioningError):
+                partitioning.swap(cursor, Recipe.objects.latest('id').id)
+
+    def test_user_queries_prune_partitions(self):
+        """Test queries filtered by user only scan one partition."""
+        if not self.partitioned:
+            with connection.cursor() as cursor:
+                """let the old table go without pending deferred FK checks"""
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            self.partition('--drop-old')
+
+        plan = Recipe.objects.filter(user=self.users[0]).order_by(
+            '-id'
+        ).explain()
+
+        self.assertEqual(
+            len(set(re.findall(r'core_recipe_p(\d+)', plan))),
+            1,
+            plan
+        )
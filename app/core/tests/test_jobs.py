@@ -0,0 +1,205 @@
+"""Tests for the background job queue."""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, Recipe, RecipeStats, RecipeTombstone
+
+
+@jobs.job('tests.echo')
+def echo(job):
+    """Return the payload of the job."""
+    return job.payload
+
+
+@jobs.job('tests.wait_for_renewal')
+def wait_for_renewal(job):
+    """Return whether the lease of the job is renewed within a second."""
+    for _ in range(100):
+        if Job.objects.get(pk=job.pk).locked_at > job.locked_at:
+            return True
+        time.sleep(0.01)
+
+    return False
+
+
+@jobs.job('tests.fail')
+def fail(job):
+    """Always fail."""
+    raise RuntimeError('job failed')
+
+
+class JobQueueTests(TestCase):
+    """Test enqueueing, claiming and running jobs."""
+
+    def test_enqueue_unknown_job_raises_error(self):
+        """Test enqueueing a job without handler raises LookupError."""
+        with self.assertRaises(LookupError):
+            jobs.enqueue('tests.unknown')
+
+    def test_claim_and_run_job(self):
+        """Test a claimed job runs and stores its result."""
+        job = jobs.enqueue('tests.echo', {'value': 1})
+
+        claimed = jobs.claim('worker')
+
+        self.assertEqual([c.pk for c in claimed], [job.pk])
+        self.assertEqual(claimed[0].status, Job.STATUS_RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(jobs.claim('other worker'), [])
+
+        jobs.run(claimed[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {'value': 1})
+
+    def test_delayed_job_not_claimed(self):
+        """Test a job is not claimed before its run_after."""
+        jobs.enqueue('tests.echo', delay=timedelta(minutes=5))
+
+        self.assertEqual(jobs.claim('worker'), [])
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failing job is queued again until max attempts."""
+        job = jobs.enqueue('tests.fail', max_attempts=2)
+
+        jobs.run(jobs.claim('worker')[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('job failed', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run(jobs.claim('worker')[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_delay_doubles_up_to_maximum(self):
+        """Test retry delays grow exponentially and are capped."""
+        with self.settings(
+            JOB_RETRY_BACKOFF_SECONDS=10,
+            JOB_RETRY_BACKOFF_MAX_SECONDS=60,
+        ):
+            self.assertEqual(jobs.retry_delay(1), timedelta(seconds=10))
+            self.assertEqual(jobs.retry_delay(2), timedelta(seconds=20))
+            self.assertEqual(jobs.retry_delay(10), timedelta(seconds=60))
+
+    def test_requeue_stale_job(self):
+        """Test running jobs with an expired lease are queued again."""
+        job = jobs.enqueue('tests.echo')
+        jobs.claim('worker')
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+
+    def test_outcome_not_written_after_lease_lost(self):
+        """Test a job requeued while running keeps its new state."""
+        job = jobs.enqueue('tests.echo')
+        claimed = jobs.claim('worker')[0]
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        jobs.requeue_stale()
+        jobs.claim('other worker')
+
+        self.assertFalse(jobs.renew_lease(claimed))
+        jobs.run(claimed)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_RUNNING)
+        self.assertEqual(job.locked_by, 'other worker')
+        self.assertEqual(job.attempts, 2)
+
+    def test_run_jobs_command(self):
+        """Test run_jobs --burst runs queued jobs and exits."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        Recipe.objects.create(
+            user=user,
+            title='test recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+        RecipeStats.objects.all().delete()
+        job = jobs.enqueue('core.rebuild_recipe_stats')
+
+        call_command('run_jobs', burst=True, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {'users': 1})
+        self.assertEqual(RecipeStats.objects.get(user=user).recipe_count, 1)
+
+    def test_periodic_job_scheduled_after_last_run(self):
+        """Test periodic jobs are queued once, a period after the last."""
+        scheduled = jobs.schedule_periodic()
+        prune = [job for job in scheduled
+                 if job.name == 'core.prune_recipe_tombstones']
+
+        self.assertEqual(len(prune), 1)
+        self.assertLessEqual(prune[0].run_after, timezone.now())
+        self.assertEqual(jobs.schedule_periodic(), [])
+
+        jobs.run(jobs.claim('worker')[0])
+        scheduled, = jobs.schedule_periodic()
+
+        prune[0].refresh_from_db()
+        self.assertAlmostEqual(
+            scheduled.run_after,
+            prune[0].finished_at + timedelta(days=1),
+            delta=timedelta(seconds=1)
+        )
+
+    def test_prune_recipe_tombstones(self):
+        """Test only tombstones older than SYNC_TOMBSTONE_DAYS go."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        RecipeTombstone.objects.create(
+            user=user,
+            recipe_id=1,
+            deleted_at=timezone.now() - timedelta(days=31),
+        )
+        kept = RecipeTombstone.objects.create(user=user, recipe_id=2)
+        job = jobs.enqueue('core.prune_recipe_tombstones')
+
+        call_command('run_jobs', burst=True, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'deleted': 1})
+        self.assertEqual(list(RecipeTombstone.objects.all()), [kept])
+
+
+class JobLeaseTests(TransactionTestCase):
+    """Test running jobs keep their lease."""
+
+    @override_settings(JOB_LEASE_RENEW_SECONDS=0.05)
+    def test_lease_renewed_while_running(self):
+        """Test locked_at moves forward while the handler runs."""
+        job = jobs.enqueue('tests.wait_for_renewal')
+
+        jobs.run(jobs.claim('worker')[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertIs(job.result, True)
+        self.assertIsNone(job.locked_at)
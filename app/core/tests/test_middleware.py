@@ -0,0 +1,183 @@
+"""Tests for project middleware."""
+import io
+import json
+import marshal
+import os
+import tempfile
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.middleware import StatementTimeoutMiddleware
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class ProfilerMiddlewareTests(TestCase):
+    """Test on-demand request profiling."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'pass1234'
+        )
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='pass1234'
+        )
+
+    def authenticate(self, user):
+        """Send the token of user with every request."""
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_staff_gets_profile_summary(self):
+        """Test a staff user gets the profile and executed SQL."""
+        self.authenticate(self.staff_user)
+
+        res = self.client.get(RECIPE_URL, {'_profile': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        profile = res.json()
+        self.assertEqual(profile['status'], status.HTTP_200_OK)
+        self.assertTrue(profile['functions'])
+        self.assertGreaterEqual(profile['query_count'], 1)
+        self.assertIn('core_recipe', profile['queries'][-1]['sql'])
+
+    def test_staff_gets_pstats_with_header(self):
+        """Test the X-Profile header returns a binary pstats dump."""
+        self.authenticate(self.staff_user)
+
+        res = self.client.get(RECIPE_URL, HTTP_X_PROFILE='pstats')
+
+        self.assertEqual(res['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(res.content)) as dump:
+            self.assertIsInstance(
+                marshal.loads(dump.read('request.pstats')),
+                dict
+            )
+            queries = json.loads(dump.read('queries.json'))
+        self.assertGreaterEqual(queries['query_count'], 1)
+        self.assertIn('core_recipe', queries['queries'][-1]['sql'])
+
+    def test_staff_stores_profile(self):
+        """Test store mode writes the profile and keeps the response."""
+        self.authenticate(self.staff_user)
+
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with self.settings(PROFILE_DIR=profile_dir):
+                res = self.client.get(RECIPE_URL, {'_profile': 'store'})
+            queries_path = os.path.join(
+                profile_dir,
+                res['X-Profile-Queries-File']
+            )
+            with open(queries_path) as queries_file:
+                queries = json.load(queries_file)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+        self.assertTrue(res['X-Profile-File'].endswith('.pstats'))
+        self.assertGreaterEqual(queries['query_count'], 1)
+
+    def test_non_staff_request_not_profiled(self):
+        """Test non-staff users get the normal response."""
+        self.authenticate(self.user)
+
+        res = self.client.get(RECIPE_URL, {'_profile': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+        self.assertNotIn('functions', res.json())
+
+
+class StatementTimeoutMiddlewareTests(TestCase):
+    """Test per view statement timeouts."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='pass1234'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        metrics.reset()
+
+    def get_statement_timeout(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            return cursor.fetchone()[0]
+
+    def test_view_attribute_sets_timeout(self):
+        """Test a view's statement_timeout applies to its queries."""
+        self.client.get(reverse('user:me'))
+
+        self.assertEqual(self.get_statement_timeout(), '500ms')
+
+    @override_settings(STATEMENT_TIMEOUTS={'recipe:recipe-list': 1234})
+    def test_setting_overrides_timeout(self):
+        """Test STATEMENT_TIMEOUTS sets the timeout by URL name."""
+        self.client.get(RECIPE_URL)
+
+        self.assertEqual(self.get_statement_timeout(), '1234ms')
+
+    def test_timeout_returns_503(self):
+        """Test a canceled statement becomes a 503 and is counted."""
+        def slow_view(request):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SELECT pg_sleep(1)')
+        slow_view.statement_timeout = 50
+
+        def handle(request):
+            middleware.process_view(request, slow_view, (), {})
+            try:
+                return slow_view(request)
+            except Exception as exception:
+                return middleware.process_exception(request, exception)
+
+        middleware = StatementTimeoutMiddleware(handle)
+        request = RequestFactory().get('/slow/')
+        request.resolver_match = None
+
+        res = middleware(request)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(metrics.get('statement_timeouts', view='/slow/'), 1)
+
+
+class StatementTimeoutReconnectTests(TransactionTestCase):
+    """Test statement timeouts on connections opened per request."""
+
+    def test_timeout_set_on_new_connection(self):
+        """Test a new session gets the timeout although the last had it."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='pass1234'
+        )
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        client.get(reverse('user:me'))
+        connection.close()
+        client.get(reverse('user:me'))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], '500ms')
@@ -1,7 +1,10 @@
 """Tests for models."""
 from decimal import Decimal
 
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -74,3 +77,266 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(recipe), recipe.title)
+
+
+class RecipeStatsTests(TestCase):
+    """Test per-user recipe stats are maintained on writes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+
+    def create_recipe(self, **params):
+        """Create and return a recipe of self.user."""
+        default = {
+            'title': 'test recipe',
+            'time_minutes': 10,
+            'price': Decimal('5.00'),
+        }
+        default.update(params)
+        return models.Recipe.objects.create(user=self.user, **default)
+
+    def assert_stats(self, user, count, price_total, time_minutes_total):
+        """Assert stored stats of user match the given totals."""
+        stats = models.RecipeStats.objects.get(user=user)
+        self.assertEqual(stats.recipe_count, count)
+        self.assertEqual(stats.price_total, price_total)
+        self.assertEqual(stats.time_minutes_total, time_minutes_total)
+
+    def test_create_and_update_recipe(self):
+        """Test creating and updating recipes adjusts the totals."""
+        recipe = self.create_recipe()
+        self.create_recipe(price=Decimal('2.50'), time_minutes=20)
+        self.assert_stats(self.user, 2, Decimal('7.50'), 30)
+
+        recipe = models.Recipe.objects.get(id=recipe.id)
+        recipe.price = Decimal('6.00')
+        recipe.time_minutes = 15
+        recipe.save()
+        self.assert_stats(self.user, 2, Decimal('8.50'), 35)
+
+        stats = models.RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.average_price, Decimal('4.25'))
+        self.assertEqual(stats.average_time_minutes, 17.5)
+
+    def test_delete_recipe(self):
+        """Test deleting a recipe removes it from the totals."""
+        recipe = self.create_recipe()
+        self.create_recipe()
+
+        recipe.delete()
+
+        self.assert_stats(self.user, 1, Decimal('5.00'), 10)
+
+    def test_move_recipe_to_other_user(self):
+        """Test changing the owner moves the recipe between stats."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='pass1234'
+        )
+        recipe = self.create_recipe()
+
+        recipe.user = other_user
+        recipe.save()
+
+        self.assert_stats(self.user, 0, Decimal('0.00'), 0)
+        self.assert_stats(other_user, 1, Decimal('5.00'), 10)
+
+    def test_bulk_paths(self):
+        """Test bulk create, queryset update and delete adjust totals."""
+        models.Recipe.objects.bulk_create([
+            models.Recipe(
+                user=self.user,
+                title=f'recipe {i}',
+                time_minutes=10,
+                price=Decimal('1.00'),
+            )
+            for i in range(3)
+        ])
+        self.assert_stats(self.user, 3, Decimal('3.00'), 30)
+
+        models.Recipe.objects.filter(title='recipe 0').update(
+            price=Decimal('4.00')
+        )
+        self.assert_stats(self.user, 3, Decimal('6.00'), 30)
+
+        models.Recipe.objects.filter(title='recipe 1').delete()
+        self.assert_stats(self.user, 2, Decimal('5.00'), 20)
+
+    def test_queryset_update_moves_totals_in_one_update(self):
+        """Test a bulk update writes once and moves totals by returned rows."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='pass1234'
+        )
+        self.create_recipe(title='moved')
+        self.create_recipe(title='moved', price=Decimal('2.00'))
+        self.create_recipe(title='kept')
+
+        with CaptureQueriesContext(connection) as queries:
+            count = models.Recipe.objects.filter(title='moved').update(
+                user=other_user,
+                time_minutes=F('time_minutes') + 5,
+            )
+
+        self.assertEqual(count, 2)
+        updates = [query['sql'] for query in queries.captured_queries
+                   if 'UPDATE "core_recipe"' in query['sql']]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('FOR UPDATE', updates[0])
+        self.assertNotRegex(updates[0], r' IN \(\d')
+        self.assert_stats(self.user, 1, Decimal('5.00'), 10)
+        self.assert_stats(other_user, 2, Decimal('7.00'), 30)
+
+    def test_queryset_update_of_nothing(self):
+        """Test updating no rows leaves stats alone."""
+        self.create_recipe()
+
+        count = models.Recipe.objects.filter(title='missing').update(
+            price=Decimal('9.00')
+        )
+
+        self.assertEqual(count, 0)
+        self.assert_stats(self.user, 1, Decimal('5.00'), 10)
+
+    def test_queryset_update_of_empty_filters(self):
+        """Test updates that cannot match anything return 0 untouched."""
+        self.create_recipe()
+
+        self.assertEqual(
+            models.Recipe.objects.filter(id__in=[]).update(title='new'),
+            0
+        )
+        self.assertEqual(models.Recipe.objects.none().update(title='new'), 0)
+        self.assertEqual(models.Recipe.objects.none().delete(), (0, {
+            'core.Recipe': 0,
+        }))
+        self.assert_stats(self.user, 1, Decimal('5.00'), 10)
+
+    def test_queryset_update_and_delete_of_distinct_join(self):
+        """Test distinct, ordered and joined filters update each row once."""
+        self.create_recipe(title='a')
+        self.create_recipe(title='b', price=Decimal('1.00'))
+        recipes = models.Recipe.objects.filter(
+            user__email='test@example.com'
+        ).order_by('-title').distinct()
+
+        self.assertEqual(recipes.update(time_minutes=20), 2)
+        self.assert_stats(self.user, 2, Decimal('6.00'), 40)
+
+        self.assertEqual(recipes.delete(), (2, {'core.Recipe': 2}))
+        self.assert_stats(self.user, 0, Decimal('0.00'), 0)
+        self.assertEqual(models.RecipeTombstone.objects.count(), 2)
+
+
+class RecipeSyncTests(TestCase):
+    """Test recipe changes are tracked for delta sync."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='test recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+
+    def test_queryset_update_touches_updated_at(self):
+        """Test bulk updates move updated_at forward."""
+        before = self.recipe.updated_at
+
+        models.Recipe.objects.filter(id=self.recipe.id).update(title='new')
+
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, before)
+
+    def test_delete_leaves_tombstones(self):
+        """Test deleting recipes one by one or in bulk leaves tombstones."""
+        other = models.Recipe.objects.create(
+            user=self.user,
+            title='other recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+
+        recipe_id = self.recipe.id
+        self.recipe.delete()
+        models.Recipe.objects.filter(id=other.id).delete()
+
+        self.assertEqual(
+            sorted(models.RecipeTombstone.objects.values_list(
+                'recipe_id',
+                flat=True
+            )),
+            sorted([recipe_id, other.id])
+        )
+
+
+class RecipeVersionTests(TestCase):
+    """Test optimistic concurrency on recipes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='test recipe',
+            time_minutes=10,
+            price=Decimal('5.00')
+        )
+
+    def test_save_if_version_conflict(self):
+        """Test only the first of two writers at a version succeeds."""
+        first = models.Recipe.objects.get(id=self.recipe.id)
+        second = models.Recipe.objects.get(id=self.recipe.id)
+
+        self.assertTrue(first.save_if_version(1, price=Decimal('7.00')))
+        self.assertFalse(second.save_if_version(1, price=Decimal('9.00')))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.price, Decimal('7.00'))
+        self.assertEqual(self.recipe.version, 2)
+        stats = models.RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.price_total, Decimal('7.00'))
+
+
+class UserPurgeTests(TestCase):
+    """Test deleting users with their recipes in batches."""
+
+    def test_purge_user_in_batches(self):
+        """Test purge removes the user and all related rows."""
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='pass1234'
+        )
+        for owner in (user, user, user, user, user, other_user):
+            models.Recipe.objects.create(
+                user=owner,
+                title='test recipe',
+                time_minutes=10,
+                price=Decimal('5.00')
+            )
+
+        self.assertTrue(get_user_model().objects.purge(user.pk, batch_size=2))
+
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
+        self.assertEqual(
+            list(models.Recipe.objects.values_list('user', flat=True)),
+            [other_user.pk]
+        )
+        self.assertFalse(models.RecipeStats.objects.filter(user=user.pk))
+        self.assertEqual(
+            models.RecipeStats.objects.get(user=other_user).recipe_count,
+            1
+        )
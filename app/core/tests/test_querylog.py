@@ -0,0 +1,85 @@
+"""Tests for the slow query log."""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import querylog
+from core.models import SlowQuery
+
+
+class NormalizeTests(SimpleTestCase):
+    """Test normalizing and fingerprinting statements."""
+
+    def test_normalize_replaces_literals_and_params(self):
+        """Test literals, parameters and IN lists are replaced."""
+        sql = 'SELECT  "id" FROM "t"\n WHERE "a" = %s AND "b" IN (%s, %s) ' \
+              "AND \"c\" = 'x' LIMIT 21"
+
+        self.assertEqual(
+            querylog.normalize(sql),
+            'SELECT "id" FROM "t" WHERE "a" = ? AND "b" IN (...) '
+            'AND "c" = ? LIMIT ?'
+        )
+
+    def test_same_statement_same_fingerprint(self):
+        """Test IN lists of any length share a fingerprint."""
+        short = querylog.normalize('SELECT 1 FROM t WHERE id IN (%s)')
+        long = querylog.normalize('SELECT 1 FROM t WHERE id IN (%s, %s, %s)')
+
+        self.assertEqual(
+            querylog.fingerprint(short),
+            querylog.fingerprint(long)
+        )
+
+
+class SlowQueryLogTests(TestCase):
+    """Test recording and reporting slow queries."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_slow_queries_recorded_per_view(self):
+        """Test queries over the threshold are aggregated with a plan."""
+        with self.settings(
+            SLOW_QUERY_THRESHOLD_MS=0,
+            SLOW_QUERY_EXPLAIN_RATE=1,
+        ):
+            self.client.get(reverse('recipe:recipe-list'))
+            self.client.get(reverse('recipe:recipe-list'))
+
+        query = SlowQuery.objects.get(
+            view='recipe:recipe-list',
+            sql__contains='"core_recipe"'
+        )
+        self.assertEqual(query.calls, 2)
+        self.assertGreaterEqual(query.max_ms, 0)
+        self.assertTrue(query.plan)
+
+    def test_disabled_log_records_nothing(self):
+        """Test no queries are recorded without a threshold."""
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=None):
+            self.client.get(reverse('recipe:recipe-list'))
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_slow_queries_command(self):
+        """Test the report lists queries by total time and resets."""
+        querylog.record('user:me', 'SELECT ? FROM a', 5)
+        querylog.record('user:me', 'SELECT ? FROM b', 50)
+        out = StringIO()
+
+        call_command('slow_queries', reset=True, stdout=out)
+
+        report = out.getvalue()
+        self.assertLess(report.index('FROM b'), report.index('FROM a'))
+        self.assertFalse(SlowQuery.objects.exists())
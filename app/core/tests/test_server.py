@@ -0,0 +1,121 @@
+"""Tests for the pre-forking server."""
+import socket
+import threading
+from unittest.mock import patch
+from urllib.request import urlopen
+
+from django.test import SimpleTestCase
+
+from core import server
+
+
+def hello_app(environ, start_response):
+    """Minimal WSGI application."""
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'hello']
+
+
+class ServerTests(SimpleTestCase):
+    """Test the worker side of the pre-forking server."""
+
+    def setUp(self):
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.addCleanup(self.listener.close)
+        self.url = 'http://127.0.0.1:%d/' % self.listener.getsockname()[1]
+
+    def test_default_worker_count(self):
+        """Test the default worker count is at least one."""
+        self.assertGreaterEqual(server.default_worker_count(), 1)
+
+    def test_worker_recycles_after_max_requests(self):
+        """Test a worker serves requests and exits after max_requests."""
+        worker = server.Worker(
+            self.listener,
+            hello_app,
+            max_requests=2,
+            log=lambda message: None
+        )
+        thread = threading.Thread(target=worker.serve, args=(0.05,))
+        thread.start()
+
+        for _ in range(2):
+            with urlopen(self.url, timeout=5) as res:
+                self.assertEqual(res.read(), b'hello')
+
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(worker.handled, 2)
+
+    def test_threaded_worker_overlaps_requests(self):
+        """Test a worker with threads serves connections concurrently."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def meeting_app(environ, start_response):
+            barrier.wait()
+            return hello_app(environ, start_response)
+
+        worker = server.Worker(
+            self.listener,
+            meeting_app,
+            max_requests=2,
+            threads=2,
+            log=lambda message: None
+        )
+        thread = threading.Thread(target=worker.serve, args=(0.05,))
+        thread.start()
+        bodies = []
+
+        def fetch():
+            with urlopen(self.url, timeout=5) as res:
+                bodies.append(res.read())
+
+        clients = [threading.Thread(target=fetch) for _ in range(2)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(timeout=5)
+
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(bodies, [b'hello', b'hello'])
+
+    def test_silent_connection_times_out(self):
+        """Test a client sending nothing does not hold the worker."""
+        worker = server.Worker(
+            self.listener,
+            hello_app,
+            max_requests=2,
+            timeout=0.2,
+            log=lambda message: None
+        )
+        thread = threading.Thread(target=worker.serve, args=(0.05,))
+        thread.start()
+
+        with socket.create_connection(self.listener.getsockname()) as idle:
+            idle.settimeout(5)
+            with urlopen(self.url, timeout=5) as res:
+                self.assertEqual(res.read(), b'hello')
+            self.assertEqual(idle.recv(1), b'')
+
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+    def test_worker_stops_when_asked(self):
+        """Test a stopped worker leaves its serve loop."""
+        worker = server.Worker(self.listener, hello_app)
+        thread = threading.Thread(target=worker.serve, args=(0.05,))
+        thread.start()
+
+        worker.stop()
+
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+    @patch('core.server.current_memory_mb', return_value=600)
+    def test_worker_recycles_above_memory_ceiling(self, patched_memory):
+        """Test a worker over its memory ceiling asks to be recycled."""
+        worker = server.Worker(self.listener, hello_app, max_memory_mb=512)
+
+        self.assertEqual(worker.should_recycle(), 'exceeded 512 MB')
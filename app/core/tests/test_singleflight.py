@@ -0,0 +1,124 @@
+"""
+Tests for coalescing of concurrent calls.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from core import metrics
+from core.singleflight import SingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Test the SingleFlight helper."""
+
+    def setUp(self):
+        metrics.reset()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow(self, result='result'):
+        """Count the call and block until released."""
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return result
+
+    def run_concurrently(self, flight, key, waiters, function):
+        """Start a leader, then waiters, and return all results."""
+        with ThreadPoolExecutor(waiters + 1) as executor:
+            leader = executor.submit(flight.do, key, function)
+            self.started.wait(5)
+            others = [
+                executor.submit(flight.do, key, function)
+                for _ in range(waiters)
+            ]
+            time.sleep(0.1)
+            self.release.set()
+            return [leader.result()] + [other.result() for other in others]
+
+    def test_concurrent_calls_share_result(self):
+        """Test waiters share the result of the call in flight."""
+        flight = SingleFlight('test', timeout=5)
+
+        results = self.run_concurrently(flight, 'key', 3, self.slow)
+
+        self.assertEqual(results, ['result'] * 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flight.stats['key'], {'leader': 1, 'shared': 3})
+        self.assertEqual(
+            metrics.get('single_flight', flight='test', outcome='shared'),
+            3
+        )
+        self.assertEqual(flight.calls, {})
+
+    def test_waiter_runs_itself_after_timeout(self):
+        """Test a waiter computes on its own once the timeout passes."""
+        flight = SingleFlight('test', timeout=0.01)
+
+        results = self.run_concurrently(flight, 'key', 1, self.slow)
+
+        self.assertEqual(results, ['result', 'result'])
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(flight.stats['key']['timeout'], 1)
+
+    def test_waiter_runs_itself_when_leader_fails(self):
+        """Test a failed leader does not fail its waiters."""
+        flight = SingleFlight('test', timeout=5)
+        outcomes = iter([RuntimeError('boom'), 'result'])
+
+        def flaky():
+            outcome = next(outcomes)
+            self.slow()
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with ThreadPoolExecutor(2) as executor:
+            leader = executor.submit(flight.do, 'key', flaky)
+            self.started.wait(5)
+            waiter = executor.submit(flight.do, 'key', flaky)
+            time.sleep(0.1)
+            self.release.set()
+
+            with self.assertRaises(RuntimeError):
+                leader.result()
+            self.assertEqual(waiter.result(), 'result')
+
+        self.assertEqual(flight.stats['key']['failed'], 1)
+
+    def test_stats_keep_recent_keys(self):
+        """Test per key stats are bounded to max_keys."""
+        flight = SingleFlight('test', timeout=5, max_keys=2)
+        self.release.set()
+
+        for key in ('a', 'b', 'c'):
+            flight.do(key, self.slow)
+
+        self.assertEqual(list(flight.stats), ['b', 'c'])
+
+    def test_forgotten_flight_not_joined(self):
+        """Test calls after forget start their own flight."""
+        flight = SingleFlight('test', timeout=5)
+        second_started = threading.Event()
+
+        def second():
+            second_started.set()
+            self.release.wait(5)
+            return 'new'
+
+        with ThreadPoolExecutor(2) as executor:
+            first = executor.submit(flight.do, (1, '/'), self.slow)
+            self.started.wait(5)
+            flight.forget(lambda key: key[0] == 1)
+            later = executor.submit(flight.do, (1, '/'), second)
+            second_started.wait(5)
+            self.release.set()
+
+            self.assertEqual(first.result(), 'result')
+            self.assertEqual(later.result(), 'new')
+
+        self.assertEqual(flight.calls, {})
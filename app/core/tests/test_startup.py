@@ -0,0 +1,46 @@
+"""Tests for start up helpers."""
+from django.test import SimpleTestCase
+
+from django.contrib.auth import get_user_model
+
+from core import startup
+from core.models import Recipe
+
+
+IMPORTTIME_OUTPUT = '''import time: self [us] | cumulative | imported package
+import time:       155 |        155 |   _io
+import time:      1200 |       4300 | django.urls
+not an importtime line
+'''
+
+
+class StartupTests(SimpleTestCase):
+    """Test start up helpers."""
+
+    def test_parse_importtime(self):
+        """Test importtime output is parsed into modules."""
+        modules = startup.parse_importtime(IMPORTTIME_OUTPUT)
+
+        self.assertEqual(modules, [
+            {
+                'module': '_io',
+                'depth': 1,
+                'self_ms': 0.155,
+                'cumulative_ms': 0.155,
+            },
+            {
+                'module': 'django.urls',
+                'depth': 0,
+                'self_ms': 1.2,
+                'cumulative_ms': 4.3,
+            },
+        ])
+
+    def test_warm_up_fills_model_meta_caches(self):
+        """Test warm up leaves the model field caches populated."""
+        models = startup.warm_up()
+
+        self.assertIn(Recipe, models)
+        self.assertIn(get_user_model(), models)
+        for name in startup.META_CACHES:
+            self.assertIn(name, Recipe._meta.__dict__)
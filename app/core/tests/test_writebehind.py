@@ -0,0 +1,144 @@
+"""Tests for write-behind buffering."""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core import writebehind
+
+
+class TimestampBufferTests(TestCase):
+    """Test coalescing timestamp updates."""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f'user{i}@example.com',
+                password='pass1234'
+            )
+            for i in range(3)
+        ]
+        self.buffer = writebehind.TimestampBuffer(
+            get_user_model(),
+            'last_login',
+            max_size=3,
+            interval=60
+        )
+        self.buffer.start = lambda: None
+
+    def test_flush_writes_latest_timestamp_per_user(self):
+        """Test one flush writes the newest buffered timestamp of users."""
+        now = timezone.now()
+        self.buffer.record(self.users[0].pk, now - timedelta(minutes=1))
+        self.buffer.record(self.users[0].pk, now)
+        self.buffer.record(self.users[1].pk, now - timedelta(minutes=5))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.users[0].refresh_from_db()
+        self.users[1].refresh_from_db()
+        self.users[2].refresh_from_db()
+        self.assertEqual(self.users[0].last_login, now)
+        self.assertEqual(
+            self.users[1].last_login,
+            now - timedelta(minutes=5)
+        )
+        self.assertIsNone(self.users[2].last_login)
+
+    def test_flush_never_moves_timestamp_back(self):
+        """Test a flush keeps a newer last_login written meanwhile."""
+        now = timezone.now()
+        self.buffer.record(self.users[0].pk, now - timedelta(minutes=1))
+        get_user_model().objects.filter(pk=self.users[0].pk).update(
+            last_login=now
+        )
+
+        self.buffer.flush()
+
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].last_login, now)
+
+    def test_failed_flush_keeps_timestamps(self):
+        """Test a failed UPDATE merges its batch back into the buffer."""
+        now = timezone.now()
+        self.buffer.record(self.users[0].pk, now - timedelta(minutes=1))
+        self.buffer.record(self.users[1].pk, now)
+
+        with patch.object(
+            QuerySet,
+            'update',
+            side_effect=DatabaseError('gone'),
+        ):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+        self.buffer.record(self.users[0].pk, now - timedelta(minutes=2))
+
+        self.assertEqual(self.buffer.pending, {
+            self.users[0].pk: now - timedelta(minutes=1),
+            self.users[1].pk: now,
+        })
+        self.assertEqual(self.buffer.flush(), 2)
+
+    def test_full_buffer_flushes(self):
+        """Test the buffer flushes itself once max_size users are pending."""
+        now = timezone.now()
+        for user in self.users:
+            self.buffer.record(user.pk, now)
+
+        self.assertEqual(self.buffer.pending, {})
+        self.users[2].refresh_from_db()
+        self.assertEqual(self.users[2].last_login, now)
+
+    def test_empty_flush_runs_no_query(self):
+        """Test flushing an empty buffer does not touch the database."""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.buffer.flush(), 0)
+
+
+class LastLoginTests(TestCase):
+    """Test logins record last_login."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass1234'
+        )
+        self.client = APIClient()
+        self.token_payload = {
+            'email': 'test@example.com',
+            'password': 'pass1234',
+        }
+
+    def test_token_login_updates_last_login(self):
+        """Test issuing a token writes last_login when not buffered."""
+        with self.settings(LAST_LOGIN_WRITE_BEHIND=False):
+            self.client.post(reverse('user:token'), self.token_payload)
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_token_login_buffers_last_login(self):
+        """Test issuing a token buffers last_login until a flush."""
+        buffer = writebehind.get_last_login_buffer()
+        buffer.start = lambda: None
+        self.addCleanup(vars(buffer).pop, 'start')
+
+        with self.settings(LAST_LOGIN_WRITE_BEHIND=True):
+            self.client.post(reverse('user:token'), self.token_payload)
+
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        self.assertIn(self.user.pk, buffer.pending)
+
+        writebehind.flush_all()
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
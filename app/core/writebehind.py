@@ -0,0 +1,151 @@
+"""
+Write-behind buffering of hot-row timestamp updates.
+
+Logins only need `User.last_login` to be roughly current, so instead of
+an UPDATE per login the timestamps are coalesced per user in memory and
+written with one bulk UPDATE every LAST_LOGIN_FLUSH_SECONDS, when the
+buffer holds LAST_LOGIN_BUFFER_SIZE users, and at interpreter exit.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class TimestampBuffer:
+    """Coalesce {pk: timestamp} writes to one column of a model."""
+
+    def __init__(self, model, field, max_size, interval):
+        self.model = model
+        self.field = field
+        self.max_size = max_size
+        self.interval = interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flusher = None
+        self.stopping = threading.Event()
+
+    def record(self, pk, timestamp):
+        """Remember timestamp for pk, flushing when the buffer is full."""
+        with self.lock:
+            full = self.merge({pk: timestamp}) >= self.max_size
+
+        if full:
+            self.flush()
+        else:
+            self.start()
+
+    def merge(self, timestamps):
+        """Keep the newest of timestamps and pending per pk; hold the lock."""
+        for pk, timestamp in timestamps.items():
+            current = self.pending.get(pk)
+            if current is None or timestamp > current:
+                self.pending[pk] = timestamp
+
+        return len(self.pending)
+
+    def flush(self):
+        """Write the buffered timestamps with a single UPDATE.
+
+        Stored values only ever move forward, so a flush does not undo a
+        newer timestamp written by another process. If the UPDATE fails
+        the batch is merged back into the buffer for the next flush.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+
+        output_field = self.model._meta.get_field(self.field)
+        buffered = Case(
+            *[
+                When(pk=pk, then=Value(timestamp))
+                for pk, timestamp in pending.items()
+            ],
+            output_field=output_field,
+        )
+        try:
+            return self.model._base_manager.filter(pk__in=pending).update(**{
+                self.field: Greatest(
+                    Coalesce(F(self.field), buffered),
+                    buffered,
+                ),
+            })
+        except Exception:
+            with self.lock:
+                self.merge(pending)
+            raise
+
+    def start(self):
+        """Start the background flusher once per process."""
+        if self.flusher is not None and self.flusher.is_alive():
+            return
+
+        with self.lock:
+            if self.flusher is not None and self.flusher.is_alive():
+                return
+            self.flusher = threading.Thread(
+                target=self.run,
+                name=f'{self.model._meta.label}.{self.field} flusher',
+                daemon=True,
+            )
+            self.flusher.start()
+
+    def run(self):
+        """Flush every interval until the process exits."""
+        while not self.stopping.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('flushing %s failed', self.field)
+            finally:
+                connection.close()
+
+
+_last_login_buffer = None
+
+
+def get_last_login_buffer():
+    """Return the process wide last_login buffer."""
+    global _last_login_buffer
+    if _last_login_buffer is None:
+        _last_login_buffer = TimestampBuffer(
+            get_user_model(),
+            'last_login',
+            settings.LAST_LOGIN_BUFFER_SIZE,
+            settings.LAST_LOGIN_FLUSH_SECONDS,
+        )
+        atexit.register(flush_all)
+
+    return _last_login_buffer
+
+
+def flush_all():
+    """Write every buffered timestamp now, e.g. before a worker exits."""
+    if _last_login_buffer is None:
+        return
+
+    try:
+        _last_login_buffer.flush()
+    except Exception:
+        logger.exception('flushing last_login on exit failed')
+
+
+def record_login(sender, user, **kwargs):
+    """user_logged_in receiver replacing django's update_last_login."""
+    if not settings.LAST_LOGIN_WRITE_BEHIND:
+        update_last_login(sender, user, **kwargs)
+        return
+
+    user.last_login = timezone.now()
+    get_last_login_buffer().record(user.pk, user.last_login)
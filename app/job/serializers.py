@@ -0,0 +1,24 @@
+"""Serializers for Job APIs."""
+from rest_framework import serializers
+
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs."""
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'max_attempts',
+            'run_after',
+            'result',
+            'last_error',
+            'created_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,70 @@
+"""
+Tests for job APIs.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job
+
+
+JOB_URL = reverse('job:job-list')
+
+
+def get_job_detail_url(job_id):
+    """create and return job detail URL."""
+    return reverse('job:job-detail', args=[job_id])
+
+
+class PublicJobAPITests(TestCase):
+    """Test unauthenticated job API requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test authentication is required for get job list."""
+        res = self.client.get(JOB_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateJobAPITests(TestCase):
+    """Test authenticated job API requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='pass123',
+            name='Test Name'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_job_status(self):
+        """Test retrieving the status of a job."""
+        job = jobs.enqueue('core.rebuild_recipe_stats', user=self.user)
+
+        res = self.client.get(get_job_detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.STATUS_QUEUED)
+        self.assertEqual(res.data['name'], 'core.rebuild_recipe_stats')
+
+    def test_job_list_limited_to_user(self):
+        """Test list of jobs is limited to authenticated user."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123'
+        )
+        jobs.enqueue('core.rebuild_recipe_stats', user=other_user)
+        job = jobs.enqueue('core.rebuild_recipe_stats', user=self.user)
+
+        res = self.client.get(JOB_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [job.id])
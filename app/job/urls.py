@@ -0,0 +1,22 @@
+"""
+URL mappings for job app.
+"""
+
+from django.urls import (
+    path,
+    include
+)
+
+from rest_framework.routers import DefaultRouter
+
+from job import views
+
+
+router = DefaultRouter()
+router.register('', views.JobViewSet)
+
+app_name = 'job'
+
+urlpatterns = [
+    path('', include(router.urls))
+]
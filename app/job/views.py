@@ -0,0 +1,19 @@
+"""views for Job APIs."""
+from rest_framework import viewsets
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+
+from core.models import Job
+from job import serializers
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """view for checking the status of background jobs."""
+    serializer_class = serializers.JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Retrieve jobs of authenticated user."""
+        return self.queryset.filter(user=self.request.user).order_by('-id')
@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        from core.signals import recipes_changed
+        from recipe.cache import invalidate_recipe_details
+        from recipe.events import publish_recipe_changes
+        from recipe.views import forget_recipe_lists
+
+        recipes_changed.connect(
+            invalidate_recipe_details,
+            dispatch_uid='invalidate_recipe_details',
+        )
+
+        recipes_changed.connect(
+            publish_recipe_changes,
+            dispatch_uid='publish_recipe_changes',
+        )
+
+        recipes_changed.connect(
+            forget_recipe_lists,
+            dispatch_uid='forget_recipe_lists',
+        )
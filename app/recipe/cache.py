@@ -0,0 +1,84 @@
+"""
+Read-through cache of rendered recipe details.
+
+Entries are keyed by recipe id and hold the owner, the version and the
+serialized payload, so a hit needs neither a query nor serialization,
+and ownership is checked against the cached owner. Entries are dropped
+when `core.signals.recipes_changed` reports the recipe changed, which
+covers single saves as well as bulk updates and deletes.
+
+Each recipe also has a generation token that invalidation replaces.
+Readers take the token before querying and it is stored with the entry;
+an entry whose token is no longer current is a miss. A payload read
+before a change but stored after its invalidation is thus never served.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def detail_cache_key(recipe_id):
+    """Return the cache key of a recipe's detail payload."""
+    return f'recipe:detail:{recipe_id}'
+
+
+def generation_cache_key(recipe_id):
+    """Return the cache key of a recipe's generation token."""
+    return f'recipe:detail:generation:{recipe_id}'
+
+
+def get_generation(recipe_id):
+    """Return the current generation token of a recipe, or None."""
+    if not settings.RECIPE_DETAIL_CACHE_SECONDS:
+        return None
+
+    key = generation_cache_key(recipe_id)
+    cache.add(key, uuid4().hex, settings.RECIPE_DETAIL_CACHE_SECONDS)
+    return cache.get(key)
+
+
+def get_detail(recipe_id):
+    """Return the cached {'user_id', 'version', 'data'} entry, or None."""
+    if not settings.RECIPE_DETAIL_CACHE_SECONDS:
+        return None
+
+    key = detail_cache_key(recipe_id)
+    generation_key = generation_cache_key(recipe_id)
+    entries = cache.get_many([key, generation_key])
+    entry = entries.get(key)
+    if entry is None or entry['generation'] != entries.get(generation_key):
+        return None
+
+    return entry
+
+
+def set_detail(recipe_id, generation, user_id, data):
+    """Cache the detail payload data of a recipe read at generation."""
+    if not settings.RECIPE_DETAIL_CACHE_SECONDS or generation is None:
+        return
+
+    cache.set(
+        detail_cache_key(recipe_id),
+        {
+            'generation': generation,
+            'user_id': user_id,
+            'version': data['version'],
+            'data': dict(data),
+        },
+        settings.RECIPE_DETAIL_CACHE_SECONDS,
+    )
+
+
+def invalidate_details(recipe_ids):
+    """Drop cached details of recipe_ids and start new generations."""
+    cache.set_many(
+        {generation_cache_key(pk): uuid4().hex for pk in recipe_ids},
+        settings.RECIPE_DETAIL_CACHE_SECONDS,
+    )
+    cache.delete_many([detail_cache_key(pk) for pk in recipe_ids])
+
+
+def invalidate_recipe_details(sender, ids, **kwargs):
+    """recipes_changed receiver dropping the changed recipes' details."""
+    invalidate_details(ids)
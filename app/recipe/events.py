@@ -0,0 +1,239 @@
+"""
+Server-Sent Events stream of recipe changes.
+
+Committed recipe writes are published by `core.signals.recipes_changed`
+to an in-process broadcaster, which hands them to the event loop of every
+stream the owner has open. Streams are plain ASGI applications routed by
+`app.asgi`, so they do not hold a worker thread while idle.
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class Subscription:
+    """Bounded queue of events for one stream."""
+
+    def __init__(self, user_id, loop, max_size):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(max_size)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue event; on overflow drop the backlog and ask for a resync."""
+        if self.overflowed:
+            return
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Broadcaster:
+    """Fan events out to the subscriptions of a user across threads."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id, max_size):
+        """Return a subscription bound to the running event loop."""
+        subscription = Subscription(
+            user_id,
+            asyncio.get_running_loop(),
+            max_size,
+        )
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering events to subscription."""
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event):
+        """Queue event for every stream of user_id, from any thread."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.put,
+                    event,
+                )
+            except RuntimeError:
+                """the stream's loop is closed"""
+                self.unsubscribe(subscription)
+
+        return len(subscriptions)
+
+
+broadcaster = Broadcaster()
+
+
+def publish_recipe_changes(sender, user_id, action, ids, **kwargs):
+    """recipes_changed receiver feeding the broadcaster."""
+    broadcaster.publish(user_id, {'action': action, 'ids': ids})
+
+
+def authenticate_token(key):
+    """Return (user, token) of key, dropping stale connections around it.
+
+    Streams run outside Django's request cycle, so nothing else closes
+    connections that outlived CONN_MAX_AGE or broke, as channels'
+    database_sync_to_async does.
+    """
+    if not connection.in_atomic_block:
+        close_old_connections()
+    try:
+        return TokenAuthentication().authenticate_credentials(key)
+    finally:
+        if not connection.in_atomic_block:
+            close_old_connections()
+
+
+def format_event(event):
+    """Return event encoded as an SSE message."""
+    data = json.dumps({'ids': event['ids']})
+    return f'event: {event["action"]}\ndata: {data}\n\n'.encode()
+
+
+class RecipeEventStream:
+    """ASGI application streaming the authenticated user's recipe changes.
+
+    Clients authenticate with the usual `Authorization: Token <key>`
+    header or, since EventSource cannot set headers, a `token` query
+    parameter. A `resync` event means events were dropped and the client
+    should catch up through the sync endpoint.
+    """
+
+    def __init__(self, broadcaster=broadcaster):
+        self.broadcaster = broadcaster
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            await self.reject(send, 405, 'Method not allowed.')
+            return
+
+        user = await self.authenticate(scope)
+        if user is None:
+            await self.reject(send, 401, 'Invalid or missing token.')
+            return
+
+        subscription = self.broadcaster.subscribe(
+            user.pk,
+            settings.SSE_QUEUE_SIZE,
+        )
+        try:
+            await self.stream(subscription, receive, send)
+        finally:
+            self.broadcaster.unsubscribe(subscription)
+
+    async def stream(self, subscription, receive, send):
+        """Send queued events and heartbeats until the client leaves."""
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b': connected\n\n',
+            'more_body': True,
+        })
+
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        next_event = asyncio.ensure_future(subscription.queue.get())
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    {disconnected, next_event},
+                    timeout=settings.SSE_HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    return
+
+                if next_event not in done:
+                    body = b': heartbeat\n\n'
+                elif next_event.result() is None:
+                    await send({
+                        'type': 'http.response.body',
+                        'body': b'event: resync\ndata: {}\n\n',
+                    })
+                    return
+                else:
+                    body = format_event(next_event.result())
+                    next_event = asyncio.ensure_future(
+                        subscription.queue.get()
+                    )
+
+                await send({
+                    'type': 'http.response.body',
+                    'body': body,
+                    'more_body': True,
+                })
+        finally:
+            disconnected.cancel()
+            next_event.cancel()
+
+    async def wait_disconnect(self, receive):
+        """Return once the client has closed the connection."""
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def authenticate(self, scope):
+        """Return the user of the request token, or None."""
+        key = None
+        for name, value in scope['headers']:
+            if name == b'authorization':
+                parts = value.decode('latin-1').split()
+                if len(parts) == 2 and parts[0].lower() == 'token':
+                    key = parts[1]
+        if key is None:
+            query = parse_qs(scope.get('query_string', b'').decode())
+            key = query.get('token', [None])[0]
+        if not key:
+            return None
+
+        try:
+            user, _ = await sync_to_async(authenticate_token)(key)
+        except AuthenticationFailed:
+            return None
+
+        return user
+
+    async def reject(self, send, status, detail):
+        """Send a JSON error response like DRF's."""
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': json.dumps({'detail': detail}).encode(),
+        })
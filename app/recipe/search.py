@@ -0,0 +1,50 @@
+"""
+Typeahead search of recipe titles.
+
+Prefix matches come first and use the (user_id, UPPER(title)) pattern
+index. Where the pg_trgm extension is installed, substring matches fill
+the remaining slots using the trigram index on UPPER(title); without it
+only prefixes are matched, since a substring scan is too slow per
+keystroke.
+"""
+from django.db import connections
+from django.db.models.functions import Upper
+
+
+"""Trigram indexes only help with terms of at least this many characters"""
+TRIGRAM_MIN_LENGTH = 3
+
+_trigram_available = {}
+
+
+def trigram_available(using='default'):
+    """Return whether pg_trgm is installed in database alias using."""
+    if using not in _trigram_available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+                )
+                available = cursor.fetchone() is not None
+        _trigram_available[using] = available
+
+    return _trigram_available[using]
+
+
+def autocomplete(queryset, term, limit):
+    """Return up to limit {'id', 'title'} of queryset matching term."""
+    queryset = queryset.order_by(Upper('title'), 'id').values('id', 'title')
+    matches = list(queryset.filter(title__istartswith=term)[:limit])
+
+    if (
+        len(matches) < limit
+        and len(term) >= TRIGRAM_MIN_LENGTH
+        and trigram_available(queryset.db)
+    ):
+        matches += queryset.filter(title__icontains=term).exclude(
+            title__istartswith=term
+        )[:limit - len(matches)]
+
+    return matches
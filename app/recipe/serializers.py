@@ -1,7 +1,13 @@
 """Serializers for Recipe APIs."""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Min, \
+    Value
+from django.db.models.functions import Cast
 from rest_framework import serializers
 
-from core.models import Recipe
+from app import calc
+from core.models import Recipe, RecipeStats
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -12,8 +18,16 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'description', 'time_minutes', 'price', 'link']
-        read_only_fields = ['id']
+        fields = [
+            'id',
+            'title',
+            'description',
+            'time_minutes',
+            'price',
+            'link',
+            'version',
+        ]
+        read_only_fields = ['id', 'version']
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -21,3 +35,177 @@ class RecipeDetailSerializer(RecipeSerializer):
 
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ['description']
+
+
+class RecipeTitleSerializer(serializers.Serializer):
+    """Serializer for typeahead matches of recipe titles."""
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serializer for the recipe stats of a user."""
+    average_price = serializers.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        read_only=True
+    )
+    total_time_minutes = serializers.IntegerField(
+        source='time_minutes_total',
+        read_only=True
+    )
+    average_time_minutes = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = RecipeStats
+        fields = [
+            'recipe_count',
+            'average_price',
+            'total_time_minutes',
+            'average_time_minutes',
+        ]
+        read_only_fields = fields
+
+
+class AdjustmentSerializer(serializers.Serializer):
+    """Serializer for an arithmetic adjustment of a recipe field."""
+    OPERATIONS = {
+        'add': calc.add,
+        'subtract': calc.subtract,
+        'multiply': calc.multiply,
+    }
+
+    operation = serializers.ChoiceField(choices=list(OPERATIONS))
+    value = serializers.DecimalField(max_digits=12, decimal_places=4)
+
+
+class RecipeAdjustSerializer(serializers.Serializer):
+    """Serializer for adjusting price and time of many recipes at once.
+
+    The same calc helper computes the new values in SQL, on F() of the
+    column, and in Python for previews and range checks. Results are
+    rounded half away from zero to the column, as Postgres does when
+    casting numeric.
+    """
+    FIELDS = ['price', 'time_minutes']
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+    )
+    title = serializers.CharField(required=False)
+    price = AdjustmentSerializer(required=False)
+    time_minutes = AdjustmentSerializer(required=False)
+    preview = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in self.FIELDS):
+            raise serializers.ValidationError(
+                'Give a price or time_minutes adjustment.'
+            )
+
+        return attrs
+
+    @property
+    def adjustments(self):
+        """Return {field: (calc function, operand)} of validated data."""
+        return {
+            field: (
+                AdjustmentSerializer.OPERATIONS[adjustment['operation']],
+                adjustment['value'],
+            )
+            for field, adjustment in self.validated_data.items()
+            if field in self.FIELDS
+        }
+
+    def filter(self, queryset):
+        """Narrow queryset to the recipes selected by the request."""
+        if 'ids' in self.validated_data:
+            queryset = queryset.filter(id__in=self.validated_data['ids'])
+        if 'title' in self.validated_data:
+            queryset = queryset.filter(
+                title__icontains=self.validated_data['title']
+            )
+
+        return queryset
+
+    def expressions(self):
+        """Return {field: expression} computing the adjusted columns."""
+        expressions = {}
+        for field, (function, operand) in self.adjustments.items():
+            model_field = Recipe._meta.get_field(field)
+            adjusted = ExpressionWrapper(
+                function(F(field), Value(operand)),
+                output_field=DecimalField(),
+            )
+            expressions[field] = Cast(adjusted, output_field=model_field)
+
+        return expressions
+
+    def adjust(self, field, value):
+        """Return value of field after the adjustment, rounded."""
+        function, operand = self.adjustments[field]
+        result = function(Decimal(value), operand)
+        model_field = Recipe._meta.get_field(field)
+        if isinstance(model_field, DecimalField):
+            return result.quantize(
+                Decimal(1).scaleb(-model_field.decimal_places),
+                rounding=ROUND_HALF_UP,
+            )
+
+        return int(result.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    def get_bounds(self, field):
+        """Return the (lowest, highest) value field may hold."""
+        model_field = Recipe._meta.get_field(field)
+        if isinstance(model_field, DecimalField):
+            whole_digits = model_field.max_digits - model_field.decimal_places
+            step = Decimal(1).scaleb(-model_field.decimal_places)
+            return Decimal(0), Decimal(10) ** whole_digits - step
+
+        return 0, 2147483647
+
+    def validate_range(self, queryset):
+        """Raise ValidationError if a recipe would leave its column range.
+
+        Adjustments are monotonic, so checking the adjusted minimum and
+        maximum of each column covers every row.
+        """
+        fields = list(self.adjustments)
+        extremes = queryset.aggregate(
+            **{f'{field}_min': Min(field) for field in fields},
+            **{f'{field}_max': Max(field) for field in fields},
+        )
+
+        errors = {}
+        for field in fields:
+            lowest, highest = self.get_bounds(field)
+            for extreme in ('min', 'max'):
+                value = extremes[f'{field}_{extreme}']
+                if value is None:
+                    continue
+                if not lowest <= self.adjust(field, value) <= highest:
+                    errors[field] = (
+                        f'Adjusted values must be between {lowest} and '
+                        f'{highest}.'
+                    )
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+    def preview_recipes(self, recipes):
+        """Return id and adjusted values of recipes as the API shows them."""
+        recipe_fields = RecipeSerializer().fields
+        return [
+            {
+                'id': recipe.id,
+                **{
+                    field: recipe_fields[field].to_representation(
+                        self.adjust(field, getattr(recipe, field))
+                    )
+                    for field in self.adjustments
+                },
+            }
+            for recipe in recipes
+        ]
@@ -1,23 +1,34 @@
 """
 Tests for recipe APIs.
 """
+from datetime import timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Recipe
 
+from recipe import cache as detail_cache
+from recipe.search import trigram_available
 from recipe.serializers import (
+    RecipeAdjustSerializer,
     RecipeSerializer,
     RecipeDetailSerializer
 )
 
 RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_STATS_URL = reverse('recipe:recipe-stats')
+RECIPE_SYNC_URL = reverse('recipe:recipe-sync')
+RECIPE_ADJUST_URL = reverse('recipe:recipe-adjust')
+RECIPE_AUTOCOMPLETE_URL = reverse('recipe:recipe-autocomplete')
 
 
 def get_recipe_detail_url(recipe_id):
@@ -142,3 +153,453 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(recipe.title, payload['title'])
         self.assertEqual(recipe.link, original_link)
         self.assertEqual(recipe.user, self.user)
+
+    def test_recipe_stats(self):
+        """Test retrieving recipe stats of authenticated user."""
+        create_recipe(self.user, price=Decimal('2.00'), time_minutes=10)
+        create_recipe(self.user, price=Decimal('3.00'), time_minutes=25)
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123'
+        )
+        create_recipe(other_user)
+
+        res = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'recipe_count': 2,
+            'average_price': '2.50',
+            'total_time_minutes': 35,
+            'average_time_minutes': 17.5,
+        })
+
+    def test_recipe_stats_without_recipes(self):
+        """Test recipe stats of a user without recipes are empty."""
+        res = self.client.get(RECIPE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['average_price'])
+
+    def test_sync_without_cursor_returns_all(self):
+        """Test a first sync returns every recipe and a cursor."""
+        recipe = create_recipe(self.user)
+
+        res = self.client.get(RECIPE_SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['reset'])
+        self.assertEqual(
+            res.data['changed'],
+            RecipeDetailSerializer([recipe], many=True).data
+        )
+        self.assertEqual(res.data['deleted'], [])
+        self.assertTrue(res.data['cursor'])
+
+    def test_sync_returns_changes_since_cursor(self):
+        """Test a sync returns only changed and deleted recipes."""
+        unchanged = create_recipe(self.user, title='unchanged')
+        changed = create_recipe(self.user, title='changed')
+        deleted = create_recipe(self.user, title='deleted')
+        past = timezone.now() - timedelta(minutes=5)
+        Recipe.objects.filter(id=unchanged.id).update(updated_at=past)
+        since = (past + timedelta(minutes=1)).isoformat()
+
+        deleted_id = deleted.id
+        deleted.delete()
+
+        res = self.client.get(RECIPE_SYNC_URL, {'since': since})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.data['reset'])
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['changed']],
+            [changed.id]
+        )
+        self.assertEqual(res.data['deleted'], [deleted_id])
+
+    def test_sync_invalid_cursor(self):
+        """Test an invalid cursor returns a bad request."""
+        res = self.client.get(RECIPE_SYNC_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_sends_version_etag(self):
+        """Test recipe detail carries its version as ETag."""
+        recipe = create_recipe(self.user)
+
+        res = self.client.get(get_recipe_detail_url(recipe.id))
+
+        self.assertEqual(res['ETag'], f'"{recipe.version}"')
+
+    def test_update_with_current_version(self):
+        """Test an update at the current version bumps the version."""
+        recipe = create_recipe(self.user)
+        url = get_recipe_detail_url(recipe.id)
+
+        res = self.client.patch(
+            url,
+            {'title': 'new title'},
+            HTTP_IF_MATCH=f'"{recipe.version}"'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], recipe.version + 1)
+        self.assertEqual(res['ETag'], f'"{recipe.version + 1}"')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'new title')
+
+    def test_update_with_stale_if_match(self):
+        """Test an update with an outdated If-Match fails with 412."""
+        recipe = create_recipe(self.user, title='original')
+        stale_version = recipe.version
+        recipe.title = 'changed elsewhere'
+        recipe.save()
+
+        res = self.client.patch(
+            get_recipe_detail_url(recipe.id),
+            {'title': 'new title'},
+            HTTP_IF_MATCH=f'"{stale_version}"'
+        )
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_412_PRECONDITION_FAILED
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'changed elsewhere')
+
+    def test_update_with_if_match_list_and_wildcard(self):
+        """Test If-Match lists match any entry and * matches any version."""
+        recipe = create_recipe(self.user)
+        url = get_recipe_detail_url(recipe.id)
+
+        listed = self.client.patch(
+            url,
+            {'title': 'listed'},
+            HTTP_IF_MATCH=f'"{recipe.version + 5}", "{recipe.version}"'
+        )
+        wildcard = self.client.patch(
+            url,
+            {'title': 'wildcard'},
+            HTTP_IF_MATCH='*'
+        )
+        unknown = self.client.patch(
+            url,
+            {'title': 'unknown'},
+            HTTP_IF_MATCH='"abc", "99"'
+        )
+
+        self.assertEqual(listed.status_code, status.HTTP_200_OK)
+        self.assertEqual(wildcard.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            unknown.status_code,
+            status.HTTP_412_PRECONDITION_FAILED
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'wildcard')
+
+    def test_update_with_stale_version_field(self):
+        """Test an update with an outdated version field fails with 409."""
+        recipe = create_recipe(self.user)
+        stale_version = recipe.version
+        Recipe.objects.filter(id=recipe.id).update(title='changed elsewhere')
+
+        res = self.client.put(
+            get_recipe_detail_url(recipe.id),
+            {
+                'title': 'new title',
+                'time_minutes': 5,
+                'price': '1.00',
+                'version': stale_version,
+            }
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_adjust_price_by_percentage(self):
+        """Test prices are scaled and rounded in one request."""
+        first = create_recipe(self.user, price=Decimal('5.25'))
+        second = create_recipe(self.user, price=Decimal('10.00'))
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123'
+        )
+        other = create_recipe(other_user, price=Decimal('5.25'))
+
+        res = self.client.post(
+            RECIPE_ADJUST_URL,
+            {'price': {'operation': 'multiply', 'value': '1.1'}},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'count': 2})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(first.price, Decimal('5.78'))
+        self.assertEqual(first.version, 2)
+        self.assertEqual(second.price, Decimal('11.00'))
+        self.assertEqual(other.price, Decimal('5.25'))
+        res = self.client.get(RECIPE_STATS_URL)
+        self.assertEqual(res.data['average_price'], '8.39')
+
+    def test_adjust_time_of_selected_recipes(self):
+        """Test only recipes matching the filter are adjusted."""
+        soup = create_recipe(self.user, title='Soup', time_minutes=20)
+        cake = create_recipe(self.user, title='Cake', time_minutes=20)
+
+        res = self.client.post(
+            RECIPE_ADJUST_URL,
+            {
+                'title': 'sou',
+                'time_minutes': {'operation': 'add', 'value': '5'},
+            },
+            format='json'
+        )
+
+        self.assertEqual(res.data, {'count': 1})
+        soup.refresh_from_db()
+        cake.refresh_from_db()
+        self.assertEqual(soup.time_minutes, 25)
+        self.assertEqual(cake.time_minutes, 20)
+
+    def test_adjust_preview(self):
+        """Test a preview returns the new values without writing them."""
+        recipe = create_recipe(
+            self.user,
+            price=Decimal('5.25'),
+            time_minutes=15
+        )
+
+        res = self.client.post(
+            RECIPE_ADJUST_URL,
+            {
+                'ids': [recipe.id],
+                'price': {'operation': 'multiply', 'value': '1.1'},
+                'time_minutes': {'operation': 'multiply', 'value': '0.9'},
+                'preview': True,
+            },
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'count': 1,
+            'recipes': [
+                {'id': recipe.id, 'price': '5.78', 'time_minutes': 14},
+            ],
+        })
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.price, Decimal('5.25'))
+        self.assertEqual(recipe.version, 1)
+
+    def test_adjust_out_of_range_rejected(self):
+        """Test nothing is written if any recipe would overflow."""
+        cheap = create_recipe(self.user, price=Decimal('5.00'))
+        create_recipe(self.user, price=Decimal('950.00'))
+
+        res = self.client.post(
+            RECIPE_ADJUST_URL,
+            {'price': {'operation': 'multiply', 'value': '1.1'}},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price', res.data)
+        cheap.refresh_from_db()
+        self.assertEqual(cheap.price, Decimal('5.00'))
+
+    def test_adjust_below_zero_rejected_by_database(self):
+        """Test a negative result missed by the range check is not stored."""
+        recipe = create_recipe(self.user, price=Decimal('5.00'))
+
+        with patch.object(RecipeAdjustSerializer, 'validate_range'):
+            res = self.client.post(
+                RECIPE_ADJUST_URL,
+                {'price': {'operation': 'subtract', 'value': '6'}},
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.price, Decimal('5.00'))
+
+    def test_create_negative_price_rejected(self):
+        """Test creating a recipe with a negative price fails validation."""
+        res = self.client.post(RECIPE_URL, {
+            'title': 'sample recipe',
+            'time_minutes': 5,
+            'price': '-1.00',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price', res.data)
+
+    def test_adjust_requires_adjustment(self):
+        """Test an adjust request without adjustments fails."""
+        res = self.client.post(RECIPE_ADJUST_URL, {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_matches_prefix(self):
+        """Test autocomplete returns id and title of prefix matches."""
+        soup = create_recipe(self.user, title='Soup')
+        sourdough = create_recipe(self.user, title='sourdough bread')
+        create_recipe(self.user, title='Cake')
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123'
+        )
+        create_recipe(other_user, title='Soup')
+
+        res = self.client.get(RECIPE_AUTOCOMPLETE_URL, {'q': 'so'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': soup.id, 'title': 'Soup'},
+            {'id': sourdough.id, 'title': 'sourdough bread'},
+        ])
+
+    def test_autocomplete_limit(self):
+        """Test autocomplete returns at most `limit` matches."""
+        for number in range(3):
+            create_recipe(self.user, title=f'Soup {number}')
+
+        res = self.client.get(
+            RECIPE_AUTOCOMPLETE_URL,
+            {'q': 'soup', 'limit': 2}
+        )
+
+        self.assertEqual(
+            [match['title'] for match in res.data],
+            ['Soup 0', 'Soup 1']
+        )
+
+    def test_autocomplete_without_term(self):
+        """Test autocomplete without a term returns nothing."""
+        create_recipe(self.user, title='Soup')
+
+        res = self.client.get(RECIPE_AUTOCOMPLETE_URL, {'q': ' '})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_substring_after_prefix(self):
+        """Test substring matches follow prefix matches with pg_trgm."""
+        if not trigram_available():
+            self.skipTest('pg_trgm is not installed')
+        bread = create_recipe(self.user, title='Bread')
+        sourdough = create_recipe(self.user, title='Sourdough bread')
+
+        res = self.client.get(RECIPE_AUTOCOMPLETE_URL, {'q': 'bread'})
+
+        self.assertEqual(
+            [match['id'] for match in res.data],
+            [bread.id, sourdough.id]
+        )
+
+
+@override_settings(RECIPE_DETAIL_CACHE_SECONDS=300)
+class RecipeDetailCacheTests(TestCase):
+    """Test the read-through cache of recipe details."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'pass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+        self.url = get_recipe_detail_url(self.recipe.id)
+
+    def test_detail_served_from_cache(self):
+        """Test a repeated detail request does not query the database."""
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_cached_detail_checks_owner(self):
+        """Test other users get 404 for a cached recipe."""
+        self.client.get(self.url)
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'password123'
+        )
+        self.client.force_authenticate(other_user)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_invalidates_cache(self):
+        """Test the detail reflects an update made through the API."""
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'title': 'new title'})
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.data['title'], 'new title')
+        self.assertEqual(res.data['version'], 2)
+
+    def test_detail_read_before_change_not_cached(self):
+        """Test a detail stored after its invalidation is not served."""
+        generation = detail_cache.get_generation(self.recipe.id)
+        stale = self.client.get(self.url).data
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(id=self.recipe.id).update(title='new title')
+        detail_cache.set_detail(
+            self.recipe.id,
+            generation,
+            self.user.id,
+            stale,
+        )
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.data['title'], 'new title')
+
+    def test_padded_id_shares_cache_entry(self):
+        """Test /01/ is cached under the pk updates invalidate."""
+        padded_url = get_recipe_detail_url(f'0{self.recipe.id}')
+        self.client.get(padded_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'title': 'new title'})
+        res = self.client.get(padded_url)
+
+        self.assertEqual(res.data['title'], 'new title')
+
+    @override_settings(RECIPE_DETAIL_CACHE_SECONDS=0)
+    def test_cache_disabled(self):
+        """Test details are read from the database with the cache off."""
+        self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bulk_paths_invalidate_cache(self):
+        """Test bulk updates and deletes drop cached details."""
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(user=self.user).update(time_minutes=99)
+        res = self.client.get(self.url)
+        self.assertEqual(res.data['time_minutes'], 99)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(user=self.user).delete()
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,245 @@
+"""
+Tests for the recipe change event stream.
+"""
+import asyncio
+import json
+from decimal import Decimal
+
+from unittest.mock import patch
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+from core.signals import recipes_changed
+
+from recipe.events import Broadcaster, RecipeEventStream
+
+
+def create_recipe(user, **params):
+    """Create and return sample recipe."""
+    default = {
+        'title': 'sample title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    default.update(params)
+    return Recipe.objects.create(user=user, **default)
+
+
+def stream_scope(headers=(), query_string=b''):
+    """Return an ASGI scope for GET /api/recipe/events/."""
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': '/api/recipe/events/',
+        'headers': list(headers),
+        'query_string': query_string,
+    }
+
+
+class RecipeChangeSignalTests(TestCase):
+    """Test recipes_changed is sent for every write path"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.events = []
+        recipes_changed.connect(self.receive)
+        self.addCleanup(recipes_changed.disconnect, self.receive)
+
+    def receive(self, sender, user_id, action, ids, **kwargs):
+        self.events.append((user_id, action, sorted(ids)))
+
+    def test_single_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.title = 'renamed'
+            recipe.save()
+        recipe_id = recipe.id
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+        self.assertEqual(self.events, [
+            (self.user.id, 'created', [recipe_id]),
+            (self.user.id, 'updated', [recipe_id]),
+            (self.user.id, 'deleted', [recipe_id]),
+        ])
+
+    def test_bulk_writes_grouped_per_user(self):
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            created = Recipe.objects.bulk_create([
+                Recipe(user=self.user, title='a', time_minutes=1,
+                       price=Decimal('1.00')),
+                Recipe(user=other, title='b', time_minutes=1,
+                       price=Decimal('1.00')),
+            ])
+        ids = {recipe.user_id: [recipe.id] for recipe in created}
+        self.events.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.all().update(time_minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.filter(user=other).delete()
+
+        self.assertCountEqual(self.events, [
+            (self.user.id, 'updated', ids[self.user.id]),
+            (other.id, 'updated', ids[other.id]),
+            (other.id, 'deleted', ids[other.id]),
+        ])
+
+    def test_sent_only_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_recipe(self.user)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.events, [])
+
+
+class BroadcasterTests(TestCase):
+    """Test fan out and backpressure of the broadcaster"""
+
+    async def test_publish_to_user_only(self):
+        broadcaster = Broadcaster()
+        mine = broadcaster.subscribe(1, 10)
+        other = broadcaster.subscribe(2, 10)
+
+        self.assertEqual(broadcaster.publish(1, {'action': 'created'}), 1)
+        await asyncio.sleep(0)
+
+        self.assertEqual(mine.queue.get_nowait(), {'action': 'created'})
+        self.assertTrue(other.queue.empty())
+
+    async def test_overflow_requests_resync(self):
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe(1, 2)
+
+        for number in range(5):
+            broadcaster.publish(1, {'ids': [number]})
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.overflowed)
+        self.assertIsNone(subscription.queue.get_nowait())
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_unsubscribe(self):
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe(1, 2)
+        broadcaster.unsubscribe(subscription)
+
+        self.assertEqual(broadcaster.publish(1, {}), 0)
+        self.assertEqual(broadcaster.subscriptions, {})
+
+
+@override_settings(SSE_HEARTBEAT_SECONDS=0.05)
+class RecipeEventStreamTests(TestCase):
+    """Test the ASGI event stream"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.broadcaster = Broadcaster()
+
+    async def test_token_required(self):
+        communicator = ApplicationCommunicator(
+            RecipeEventStream(self.broadcaster),
+            stream_scope(),
+        )
+        await communicator.send_input({'type': 'http.request'})
+
+        start = await communicator.receive_output(1)
+        body = await communicator.receive_output(1)
+
+        self.assertEqual(start['status'], 401)
+        self.assertIn(b'detail', body['body'])
+
+    async def test_streams_events_and_heartbeats(self):
+        communicator = ApplicationCommunicator(
+            RecipeEventStream(self.broadcaster),
+            stream_scope(query_string=f'token={self.token.key}'.encode()),
+        )
+        await communicator.send_input({'type': 'http.request'})
+
+        start = await communicator.receive_output(1)
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/event-stream'),
+            start['headers'],
+        )
+        await communicator.receive_output(1)
+
+        self.broadcaster.publish(
+            self.user.id,
+            {'action': 'updated', 'ids': [7]},
+        )
+        event = await communicator.receive_output(1)
+        heartbeat = await communicator.receive_output(1)
+
+        self.assertEqual(
+            event['body'],
+            b'event: updated\ndata: ' + json.dumps({'ids': [7]}).encode()
+            + b'\n\n',
+        )
+        self.assertEqual(heartbeat['body'], b': heartbeat\n\n')
+
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+        self.assertEqual(self.broadcaster.subscriptions, {})
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=5)
+    async def test_slow_client_told_to_resync(self):
+        communicator = ApplicationCommunicator(
+            RecipeEventStream(self.broadcaster),
+            stream_scope(
+                headers=[
+                    (b'authorization', f'Token {self.token.key}'.encode()),
+                ],
+            ),
+        )
+        await communicator.send_input({'type': 'http.request'})
+        await communicator.receive_output(1)
+        await communicator.receive_output(1)
+
+        subscription, = self.broadcaster.subscriptions[self.user.id]
+        for number in range(subscription.queue.maxsize + 1):
+            subscription.put({'action': 'created', 'ids': [number]})
+
+        message = await communicator.receive_output(1)
+        self.assertEqual(message['body'], b'event: resync\ndata: {}\n\n')
+        self.assertFalse(message.get('more_body', False))
+        await communicator.wait(1)
+
+
+class RecipeEventStreamConnectionTests(TransactionTestCase):
+    """Test the stream does not reuse stale database connections"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.token = Token.objects.create(user=user)
+
+    @patch('recipe.events.close_old_connections')
+    async def test_old_connections_closed_around_auth(self, patched_close):
+        stream = RecipeEventStream(Broadcaster())
+
+        user = await stream.authenticate(stream_scope(
+            query_string=f'token={self.token.key}'.encode(),
+        ))
+
+        self.assertEqual(user.pk, self.token.user_id)
+        self.assertEqual(patched_close.call_count, 2)
@@ -1,14 +1,46 @@
 """views for Recipe APIs."""
-from rest_framework import viewsets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, \
+    ValidationError
+from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Recipe
-from recipe import serializers
+from core.models import Recipe, RecipeStats, RecipeTombstone
+from core.singleflight import SingleFlight, coalesce_response
+from recipe import cache, search, serializers
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Recipe was changed since the If-Match version.'
+    default_code = 'precondition_failed'
+
+
+class VersionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Recipe was changed since the given version.'
+    default_code = 'version_conflict'
+
+
+def forget_recipe_lists(sender, user_id, **kwargs):
+    """recipes_changed receiver keeping new lists from joining old reads."""
+    RecipeViewSet.list_flight.forget(lambda key: key[0] == user_id)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """view for manage Recipe APIs."""
+    list_flight = SingleFlight(
+        'recipe-list',
+        settings.SINGLE_FLIGHT_TIMEOUT_SECONDS,
+    )
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
@@ -22,8 +54,224 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """return the serializer class for request."""
         if self.action == 'list':
             return serializers.RecipeSerializer
+        if self.action == 'stats':
+            return serializers.RecipeStatsSerializer
+        if self.action == 'adjust':
+            return serializers.RecipeAdjustSerializer
+        if self.action == 'autocomplete':
+            return serializers.RecipeTitleSerializer
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        """List recipes, sharing the work of identical concurrent lists."""
+        return coalesce_response(
+            self.list_flight,
+            (request.user.id, request.get_full_path()),
+            super().list,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return recipe detail, from the cache when possible."""
+        lookup = kwargs[self.lookup_field]
+        if not (lookup.isascii() and lookup.isdigit()):
+            return super().retrieve(request, *args, **kwargs)
+
+        """key by the integer pk invalidation uses, so /01/ is /1/"""
+        recipe_id = int(lookup)
+        cached = cache.get_detail(recipe_id)
+        if cached is not None:
+            if cached['user_id'] != request.user.id:
+                raise NotFound()
+            return Response(cached['data'])
+
+        generation = cache.get_generation(recipe_id)
+        response = super().retrieve(request, *args, **kwargs)
+        cache.set_detail(recipe_id, generation, request.user.id, response.data)
+        return response
+
     def perform_create(self, serializer):
         """create a new recipe."""
         serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """update recipe unless it changed since the version client read."""
+        recipe = serializer.instance
+        if_match = self.request.headers.get('If-Match')
+        version = self.request.data.get('version')
+
+        conflict = VersionConflict
+        if if_match is not None and if_match.strip() != '*':
+            """a list matches if any of its versions is the current one"""
+            if recipe.version not in self.parse_if_match(if_match):
+                raise PreconditionFailed()
+            expected = recipe.version
+            conflict = PreconditionFailed
+        elif version is not None:
+            expected = self.parse_version(version)
+        else:
+            expected = recipe.version
+
+        if not recipe.save_if_version(expected, **serializer.validated_data):
+            raise conflict()
+
+    def parse_if_match(self, value):
+        """Return the versions listed in an If-Match header.
+
+        Entries that are not recipe versions cannot match and are skipped.
+        """
+        versions = set()
+        for entry in value.split(','):
+            entry = entry.strip()
+            if entry.startswith('W/'):
+                entry = entry[2:]
+            entry = entry.strip('"')
+            if entry.isascii() and entry.isdigit():
+                versions.add(int(entry))
+
+        return versions
+
+    def parse_version(self, value):
+        """Parse a version from a body field."""
+        value = str(value).strip()
+        if value.startswith('W/'):
+            value = value[2:]
+        try:
+            return int(value.strip('"'))
+        except ValueError:
+            raise ValidationError({'version': 'Expected a recipe version.'})
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Send the recipe version as ETag of detail responses."""
+        response = super().finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs
+        )
+        data = getattr(response, 'data', None)
+        if self.detail and isinstance(data, dict) and 'version' in data:
+            response['ETag'] = f'"{data["version"]}"'
+
+        return response
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Return the recipe stats of authenticated user."""
+        stats = RecipeStats.objects.filter(user=request.user).first()
+        if stats is None:
+            stats = RecipeStats(user=request.user)
+
+        serializer = self.get_serializer(stats)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def adjust(self, request):
+        """Adjust price and/or time_minutes of the selected recipes.
+
+        Recipes are selected by `ids` and/or a `title` substring and all
+        updated by a single UPDATE. The request is rejected if any recipe
+        would leave its column range; the range is checked up front for a
+        clear error and enforced by the database against concurrent writes.
+        With `preview` nothing is written and the new values of the first
+        ADJUST_PREVIEW_LIMIT recipes are returned instead.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.filter(self.get_queryset())
+
+        with transaction.atomic():
+            serializer.validate_range(recipes)
+            if serializer.validated_data['preview']:
+                return Response({
+                    'count': recipes.count(),
+                    'recipes': serializer.preview_recipes(
+                        recipes[:settings.ADJUST_PREVIEW_LIMIT]
+                    ),
+                })
+
+            try:
+                with transaction.atomic():
+                    count = recipes.update(**serializer.expressions())
+            except (DataError, IntegrityError):
+                """a concurrent write pushed a recipe out of range: above
+                the column overflows, below 0 fails the check constraints"""
+                raise ValidationError(
+                    {'detail': 'Adjusted values are out of range.'}
+                )
+
+        return Response({'count': count})
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Return id and title of recipes whose title matches `q`."""
+        term = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get(
+                'limit',
+                settings.AUTOCOMPLETE_LIMIT
+            ))
+        except ValueError:
+            raise ValidationError({'limit': 'Expected a number.'})
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+
+        if not term:
+            return Response([])
+
+        matches = search.autocomplete(
+            Recipe.objects.filter(user=request.user),
+            term,
+            limit,
+        )
+        return Response(self.get_serializer(matches, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """Return recipes changed and deleted since the `since` cursor.
+
+        Without a cursor, or with one older than the tombstone retention,
+        all recipes are returned with `reset` set. The new cursor lags
+        SYNC_CURSOR_OVERLAP_SECONDS behind the server clock so writes
+        committing during the request are not missed; clients may see
+        such changes twice.
+        """
+        now = timezone.now()
+        recipes = self.get_queryset()
+        deleted = []
+        since = self.get_sync_cursor(request)
+        oldest = now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+        reset = since is None or since < oldest
+
+        if not reset:
+            recipes = recipes.filter(updated_at__gt=since)
+            deleted = RecipeTombstone.objects.filter(
+                user=request.user,
+                deleted_at__gt=since,
+            ).values_list('recipe_id', flat=True)
+
+        cursor = now - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS)
+        return Response({
+            'cursor': cursor.isoformat(),
+            'reset': reset,
+            'changed': self.get_serializer(recipes, many=True).data,
+            'deleted': list(deleted),
+        })
+
+    def get_sync_cursor(self, request):
+        """Parse the `since` query parameter into a datetime."""
+        since = request.query_params.get('since')
+        if not since:
+            return None
+
+        try:
+            cursor = parse_datetime(since)
+        except ValueError:
+            cursor = None
+        if cursor is None or timezone.is_naive(cursor):
+            raise ValidationError(
+                {'since': 'Expected a cursor returned by a previous sync.'}
+            )
+
+        return cursor
@@ -5,12 +5,40 @@ from django.contrib.auth import (
     get_user_model,
     authenticate
 )
+from django.db import IntegrityError, transaction
 
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
 
+UNIQUE_VIOLATION = '23505'
+
+
+def is_duplicate_email(error):
+    """Return whether an IntegrityError comes from the email constraint.
+
+    Postgres names the constraint after the table and column, e.g.
+    core_user_email_key, or core_user_email_<hash>_uniq if Django added it.
+    """
+    cause = error.__cause__
+    if getattr(cause, 'pgcode', None) != UNIQUE_VIOLATION:
+        return False
+
+    meta = get_user_model()._meta
+    prefix = f'{meta.db_table}_{meta.get_field("email").column}_'
+    return (cause.diag.constraint_name or '').startswith(prefix)
+
+
+def raise_if_duplicate_email(error):
+    """Turn a duplicate email IntegrityError into a validation error."""
+    if is_duplicate_email(error):
+        raise serializers.ValidationError(
+            {'email': [_('user with this email already exists.')]},
+            'unique'
+        )
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object."""
 
@@ -18,23 +46,33 @@ class UserSerializer(serializers.ModelSerializer):
         model = get_user_model()
         fields = ['email', 'password', 'name']
         extra_kwargs = {
-            'password': {'write_only': True, 'min_length': 5}
+            'password': {'write_only': True, 'min_length': 5},
+            # uniqueness is enforced by the database constraint instead
+            # of a SELECT before every write, see raise_if_duplicate_email
+            'email': {'validators': []},
         }
 
     def create(self, validated_data):
         """Create and return user with encrypted password."""
-        return get_user_model().objects.create_user(**validated_data)
+        try:
+            with transaction.atomic():
+                return get_user_model().objects.create_user(**validated_data)
+        except IntegrityError as error:
+            raise_if_duplicate_email(error)
+            raise
 
     def update(self, instance, validated_data):
         """Update and return user."""
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
 
-        return user
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError as error:
+            raise_if_duplicate_email(error)
+            raise
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -1,11 +1,18 @@
 """Tests for the user API."""
-from django.test import TestCase
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.serializers import is_duplicate_email
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -17,6 +24,7 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
+@override_settings(LAST_LOGIN_WRITE_BEHIND=False)
 class PublicUserAPITests(TestCase):
     """Test the public features of user API."""
 
@@ -37,6 +45,24 @@ class PublicUserAPITests(TestCase):
         self.assertTrue(user.check_password(request_body['password']))
         self.assertNotIn('password', res.data)
 
+    def test_is_duplicate_email_checks_constraint(self):
+        """Test only the email unique constraint counts as a duplicate."""
+        create_user(email='email@example.com', password='testpass1234')
+
+        with self.assertRaises(IntegrityError) as duplicate, \
+                transaction.atomic():
+            get_user_model().objects.create(email='email@example.com')
+        with self.assertRaises(IntegrityError) as missing_password, \
+                transaction.atomic():
+            get_user_model().objects.create(
+                email='email2@example.com',
+                password=None,
+            )
+
+        self.assertTrue(is_duplicate_email(duplicate.exception))
+        self.assertIn('email', str(missing_password.exception))
+        self.assertFalse(is_duplicate_email(missing_password.exception))
+
     def test_user_with_email_exists_error(self):
         """Test error returned if user with same email exists."""
         request_body = {
@@ -50,6 +76,26 @@ class PublicUserAPITests(TestCase):
         res = self.client.post(CREATE_USER_URL, request_body)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['email'],
+            ['user with this email already exists.']
+        )
+
+    def test_create_user_without_select(self):
+        """Test signup inserts without checking the email first."""
+        request_body = {
+            'email': 'testapi@example.com',
+            'password': 'testpass1234',
+            'name': 'Test Name'
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(CREATE_USER_URL, request_body)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertNotIn('SELECT', statements)
+        self.assertEqual(statements.count('INSERT'), 1)
 
     def test_password_too_short_error(self):
         """Test an error is returned if password is less than 5 chars."""
@@ -162,3 +208,26 @@ class PrivateUserAPITests(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.name, request_data['name'])
         self.assertTrue(self.user.check_password(request_data['password']))
+
+    def test_update_email_to_existing_error(self):
+        """Test changing email to one in use returns a validation error."""
+        create_user(email='other@example.com', password='pass1234')
+
+        res = self.client.patch(ME_URL, {'email': 'other@example.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
+    def test_delete_user_deactivates_and_purges_later(self):
+        """Test deleting the account deactivates it and queues a purge."""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        call_command('run_jobs', burst=True, stdout=StringIO())
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
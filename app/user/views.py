@@ -1,14 +1,21 @@
 """
 Views for the user API.
 """
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+
 from rest_framework import (
     generics,
     authentication,
-    permissions
+    permissions,
+    status
 )
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core import jobs
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer
@@ -25,13 +32,35 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Return token of the user and record the login."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
+
+        return Response({'token': token.key})
+
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    statement_timeout = 500
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user now and delete their data in the background."""
+        user = self.get_object()
+        with transaction.atomic():
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            Token.objects.filter(user=user).delete()
+            job = jobs.enqueue('core.purge_user', {'user_id': user.pk})
+
+        return Response({'job': job.pk}, status=status.HTTP_202_ACCEPTED)